@@ -1,11 +1,31 @@
+import time
+APP_STARTED = time.perf_counter()  # Reference point for the startup timings
 import tkinter as tk
 from tkinter import filedialog, Label, Frame, Canvas, ttk, messagebox
 import cv2
+import functools
 import numpy as np
+import os
 import threading
-from ultralytics import YOLO
-import supervision as sv
 from PIL import Image, ImageTk
+from annotators import ANNOTATOR_MODES, make_annotator
+from batch_infer import BatchedPersonTracker
+from count_log import CountLog
+from counting import CrossingCounter, load_counting, normalize_line, save_counting
+from detection import PERSON_CLASS_ID, PersonTracker, count_persons
+from detection_cache import DetectionCache, cache_key
+from detector_backend import DEFAULT_BACKEND, load_detector
+from frame_reader import SampledFrameReader
+from frame_skip import AdaptiveStrideController, AdaptiveTracker
+from instrumentation import JsonLinesExporter, StageStats
+from mailbox import LatestFrameMailbox
+from motion_gate import MotionGatedTracker
+from multi_stream import MultiStreamWindow
+from pipeline import PipelineWorker, StagedPipeline
+from preprocess import LetterboxPreprocessor, SourceFrameInput
+from roi import RoiTracker, load_rois, normalize_roi, save_rois
+from shm_ring import ProcessPipeline, person_tracker
+from video_export import BackgroundVideoWriter
 
 class VideoAnnotatorApp:
     def __init__(self, root):
@@ -15,8 +35,43 @@ class VideoAnnotatorApp:
         
         self.video_path = None
         self.annotation_mode = "Ellips"
-        self.model = YOLO("yolo11s.pt")
-        self.running = False  # Flag to control video playback
+        self.annotators = {}  # One annotator per mode, kept so switching back resumes its state
+        self.model_path = "yolo11s.pt"
+        self.detector_backend = DEFAULT_BACKEND  # "torch", "onnx" or "openvino" (falls back to torch)
+        self.model = None  # Loaded on a background thread so the window shows straight away
+        self.startup = {}  # Seconds since launch: window shown, model loaded, warmed up and ready
+        self.detection_cache = DetectionCache()  # Replaying an already processed video skips YOLO
+        self.worker = PipelineWorker(self.process_video)  # The only thread allowed to process video
+        self.sample_stride = 1  # Decode every frame...
+        self.sample_fps = None  # ...or set an effective rate such as 5 fps instead
+        self.target_fps = None  # Output rate YOLO cadence adapts to; None follows the sampled rate
+        self.imgsz_steps = (640, 480, 320)  # Model input sizes to fall back through on slow machines
+        self.max_stride = 8  # At most this many frames between detections when the machine falls behind
+        self.letterbox_input = True  # Letterbox source frames straight to the model input (undistorted, one resize)
+        self.motion_gate = True  # Skip YOLO on frames where nothing moved since the last detection
+        self.batch_size = 1  # >1 stacks frames into one YOLO call (offline videos: no motion gate or frame skipping)
+        self.queue_depth = 4  # Frames buffered between decode, inference and annotation stages
+        self.multiprocess = False  # Decode and YOLO in their own processes, frames passed through shared memory
+        self.display_mailbox = LatestFrameMailbox()  # Latest annotated frame waiting for the Tk loop
+        self.display_refresh_ms = 16  # Poll the mailbox at roughly the screen refresh rate (60 Hz)
+        self.photo = None  # PhotoImage reused for every frame of the same size
+        self.multi_stream = None  # Grid window sharing self.model, when open
+        self.export_path = None  # Annotated video is also encoded here (on its own thread) when set
+        self.export_size = None  # None encodes at the display size
+        self.export_fps = None  # None encodes at the sampled frame rate
+        self.roi_config = "rois.json"  # Regions of interest, as frame fractions, kept between sessions
+        self.rois = load_rois(self.roi_config) if os.path.exists(self.roi_config) else []
+        self.roi_items = []  # Canvas rectangles outlining self.rois
+        self.roi_drag = None  # (x, y, rectangle) while a new ROI is being dragged out
+        self.counting_config = "counting.json"  # In/out lines and occupancy zones, as frame fractions
+        self.count_lines, self.count_zones = load_counting(self.counting_config) if os.path.exists(self.counting_config) else ([], [])
+        self.count_items = []  # Canvas outlines of the lines and zones
+        self.line_drag = None  # (x, y, line) while a new counting line is being dragged out
+        self.stats = StageStats()  # Per-stage latency histograms for the live panel
+        self.stats_exporter = JsonLinesExporter(self.stats, "pipeline_stats.jsonl")  # Snapshots for offline analysis
+        self.stats_refresh_ms = 500
+        self.count_log = CountLog("counts.sqlite")  # Per-frame counts and track boxes, written on its own thread
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
         
         # Layout setup
         self.control_frame = Frame(root, width=300, height=750, bg="#2C3E50")  # Dark grayish-blue
@@ -27,6 +82,13 @@ class VideoAnnotatorApp:
         
         self.canvas = Canvas(self.video_frame, width=900, height=750, bg="black")
         self.canvas.pack()
+        self.canvas_image = self.canvas.create_image(0, 0, anchor=tk.NW)
+        self.canvas.bind("<ButtonPress-1>", self.begin_roi)
+        self.canvas.bind("<B1-Motion>", self.drag_roi)
+        self.canvas.bind("<ButtonRelease-1>", self.end_roi)
+        self.canvas.bind("<ButtonPress-3>", self.begin_line)
+        self.canvas.bind("<B3-Motion>", self.drag_line)
+        self.canvas.bind("<ButtonRelease-3>", self.end_line)
         
         # Controls
         self.load_button = tk.Button(self.control_frame, text="Load Video", command=self.load_video, bg="#1ABC9C", fg="white", font=("Arial", 12, "bold"), relief=tk.FLAT)
@@ -38,13 +100,40 @@ class VideoAnnotatorApp:
         self.mode_label.pack(pady=5)
         
         self.mode_dropdown = ttk.Combobox(self.control_frame, textvariable=self.mode_var, 
-                                          values=["Ellips", "RoundBox", "Triangle", "HeatMap", "Label", "Trace", "Pixelate", "BoxCorner", "Circle", "Blur"], 
+                                          values=list(ANNOTATOR_MODES), 
                                           state="readonly", font=("Arial", 12))
         self.mode_dropdown.pack(pady=5, padx=10, fill=tk.X)
         self.mode_dropdown.bind("<<ComboboxSelected>>", lambda event: self.set_mode())
         
-        self.play_button = tk.Button(self.control_frame, text="Play Video", command=self.start_video, bg="#E74C3C", fg="white", font=("Arial", 12, "bold"), relief=tk.FLAT)
-        self.play_button.pack(pady=20, padx=10, fill=tk.X)
+        self.play_button = tk.Button(self.control_frame, text="Play Video", command=self.start_video, bg="#E74C3C", fg="white", font=("Arial", 12, "bold"), relief=tk.FLAT, state=tk.DISABLED)
+        self.play_button.pack(pady=(20, 5), padx=10, fill=tk.X)
+        
+        self.stop_button = tk.Button(self.control_frame, text="Stop", command=self.stop_video, bg="#7F8C8D", fg="white", font=("Arial", 12, "bold"), relief=tk.FLAT)
+        self.stop_button.pack(pady=5, padx=10, fill=tk.X)
+        
+        self.export_var = tk.BooleanVar(value=False)
+        self.export_check = tk.Checkbutton(self.control_frame, text="Save annotated video", variable=self.export_var, command=self.toggle_export, bg="#2C3E50", fg="white", selectcolor="#34495E", activebackground="#2C3E50", activeforeground="white", font=("Arial", 11))
+        self.export_check.pack(pady=5, padx=10, anchor=tk.W)
+        
+        self.multi_button = tk.Button(self.control_frame, text="Multi-Stream", command=self.open_multi_stream, bg="#8E44AD", fg="white", font=("Arial", 12, "bold"), relief=tk.FLAT, state=tk.DISABLED)
+        self.multi_button.pack(pady=5, padx=10, fill=tk.X)
+        
+        self.heatmap_button = tk.Button(self.control_frame, text="Export Heatmap", command=self.export_heatmap, bg="#D35400", fg="white", font=("Arial", 12, "bold"), relief=tk.FLAT)
+        self.heatmap_button.pack(pady=5, padx=10, fill=tk.X)
+        
+        self.roi_label = Label(self.control_frame, text="Drag on the video to add a detection area", bg="#2C3E50", fg="white", font=("Arial", 10), wraplength=260)
+        self.roi_label.pack(pady=(15, 0))
+        
+        self.clear_roi_button = tk.Button(self.control_frame, text="Clear Areas", command=self.clear_rois, bg="#7F8C8D", fg="white", font=("Arial", 12, "bold"), relief=tk.FLAT)
+        self.clear_roi_button.pack(pady=5, padx=10, fill=tk.X)
+        self.draw_rois()
+        
+        self.count_config_label = Label(self.control_frame, text="Right-drag on the video to add a counting line", bg="#2C3E50", fg="white", font=("Arial", 10), wraplength=260)
+        self.count_config_label.pack(pady=(15, 0))
+        
+        self.clear_lines_button = tk.Button(self.control_frame, text="Clear Lines", command=self.clear_lines, bg="#7F8C8D", fg="white", font=("Arial", 12, "bold"), relief=tk.FLAT)
+        self.clear_lines_button.pack(pady=5, padx=10, fill=tk.X)
+        self.draw_counting()
         
         self.info_frame = Frame(self.control_frame, bg="#2C3E50", pady=20)
         self.info_frame.pack(side=tk.BOTTOM, fill=tk.X)
@@ -55,9 +144,57 @@ class VideoAnnotatorApp:
         self.mode_info_label = Label(self.info_frame, text=f"Mode: {self.annotation_mode}", bg="#1F618D", fg="white", font=("Arial", 14, "bold"), relief=tk.RIDGE, padx=10, pady=5)
         self.mode_info_label.pack(pady=5, padx=10, fill=tk.X)
         
+        self.count_label = Label(self.info_frame, text="In: 0  Out: 0", bg="#1F618D", fg="white", font=("Arial", 14, "bold"), relief=tk.RIDGE, padx=10, pady=5, justify=tk.LEFT)
+        self.count_label.pack(pady=5, padx=10, fill=tk.X)
+        
+        self.stats_label = Label(self.info_frame, text="FPS: -", bg="#1F618D", fg="white", font=("Courier", 10), relief=tk.RIDGE, padx=10, pady=5, justify=tk.LEFT, anchor=tk.W)
+        self.stats_label.pack(pady=5, padx=10, fill=tk.X)
+        
+        self.model_label = Label(self.info_frame, text="Model: loading...", bg="#7F8C8D", fg="white", font=("Arial", 12, "bold"), relief=tk.RIDGE, padx=10, pady=5)
+        self.model_label.pack(pady=5, padx=10, fill=tk.X)
+        
+        self.root.after(self.display_refresh_ms, self.poll_display)
+        self.root.after(self.stats_refresh_ms, self.refresh_stats)
+        self.root.after_idle(self.mark_window_shown)
+        threading.Thread(target=self.load_model, name="model-loader", daemon=True).start()
+        
+    def mark_window_shown(self):
+        self.startup["window_shown_s"] = round(time.perf_counter() - APP_STARTED, 3)
+        
+    def load_model(self):
+        # Runs on its own thread: ultralytics/torch import, weights load and a dummy inference
+        try:
+            start = time.perf_counter()
+            model = load_detector(self.model_path, backend=self.detector_backend)
+            loaded = time.perf_counter()
+            # The first inference sets up the predictor (and the exported runtime); pay for it now
+            model.predict(np.zeros((750, 900, 3), dtype=np.uint8), classes=PERSON_CLASS_ID, verbose=False)
+            make_annotator(self.annotation_mode)  # Imports supervision ahead of the first frame
+            warmed = time.perf_counter()
+        except Exception as exc:
+            self.root.after(0, self.on_model_failed, exc)
+            return
+        timings = {"model_load_s": round(loaded - start, 3), "warmup_s": round(warmed - loaded, 3)}
+        self.root.after(0, self.on_model_ready, model, timings)
+        
+    def on_model_ready(self, model, timings):
+        self.model = model
+        self.startup.update(timings)
+        self.startup["ready_s"] = round(time.perf_counter() - APP_STARTED, 3)
+        self.model_label.config(text=f"Model: ready ({model.detector_backend}, {self.startup['ready_s']:.1f} s)", bg="#27AE60")
+        self.play_button.config(state=tk.NORMAL)
+        self.multi_button.config(state=tk.NORMAL)
+        self.stats_exporter.write_event("startup", backend=model.detector_backend, **self.startup)
+        
+    def on_model_failed(self, exc):
+        self.model_label.config(text="Model: failed to load", bg="#C0392B")
+        messagebox.showerror("Model Error", f"Could not load {self.model_path}: {exc}")
+        
     def load_video(self):
         self.video_path = filedialog.askopenfilename(filetypes=[("Video Files", "*.mp4;*.avi;*.mov")])
         if self.video_path:
+            self.stop_video()
+            self.annotators.pop("HeatMap", None)  # The heatmap belongs to one scene
             messagebox.showinfo("Video Loaded", f"Successfully loaded video: {self.video_path}")
             # print(f"Loaded video: {self.video_path}")
     
@@ -65,85 +202,319 @@ class VideoAnnotatorApp:
         self.annotation_mode = self.mode_var.get()
         # print(f"Annotation mode set to: {self.annotation_mode}")
         self.mode_info_label.config(text=f"Mode: {self.annotation_mode}")
-        self.running = False  # Stop current video processing
+        # The running pipeline picks up the new annotator on its next frame
         
     def start_video(self):
-        if not self.video_path:
+        # Play / Pause / Resume on one button; never starts a second pipeline
+        if not self.video_path or self.model is None:
             # print("Please load a video first!")
             return
         
-        self.running = False  # Stop any ongoing processing before switching mode
-        thread = threading.Thread(target=self.process_video, daemon=True)
-        thread.start()
+        if self.multi_stream_running():
+            messagebox.showwarning("Busy", "Close the multi-stream window first, it is using the model.")
+            return
+        
+        if self.worker.paused:
+            self.worker.resume()
+        elif self.worker.active:
+            self.worker.pause()
+        elif not self.worker.start():
+            messagebox.showwarning("Busy", "The previous video is still shutting down, try again in a moment.")
+        self.refresh_controls()
+    
+    def stop_video(self):
+        if not self.worker.stop(timeout=5.0):
+            messagebox.showwarning("Busy", "Video processing did not stop within 5 seconds.")
+        self.display_mailbox.clear()
+        self.refresh_controls()
     
-    def process_video(self):
-        self.running = True
-        cap = cv2.VideoCapture(self.video_path)
-        annotator = self.get_annotator()
-        count = 0
+    def toggle_export(self):
+        # Takes effect on the next Play
+        if not self.export_var.get():
+            self.export_path = None
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".mp4", filetypes=[("MP4 Video", "*.mp4")])
+        if path:
+            self.export_path = path
+        else:
+            self.export_var.set(False)
+    
+    def export_heatmap(self):
+        annotator = self.annotators.get("HeatMap")
+        if annotator is None or annotator.heatmap is None:
+            messagebox.showinfo("Heatmap", "Play a video in HeatMap mode first.")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".png", filetypes=[("PNG Image", "*.png")])
+        if path:
+            paths = annotator.heatmap.export(os.path.splitext(path)[0])
+            messagebox.showinfo("Heatmap", "Saved " + ", ".join(os.path.basename(path) for path in paths))
+    
+    def open_multi_stream(self):
+        if self.model is None or self.multi_stream_running():
+            return
+        paths = filedialog.askopenfilenames(filetypes=[("Video Files", "*.mp4;*.avi;*.mov")])
+        if not paths:
+            return
+        self.stop_video()  # One detector, so the single-video pipeline gives it up first
+        if self.worker.active:
+            messagebox.showwarning("Busy", "The video is still shutting down, open Multi-Stream again in a moment.")
+            return
+        self.multi_stream = MultiStreamWindow(self.root, self.model, list(paths), mode=self.annotation_mode,
+                                              count_log=self.count_log)
+    
+    def multi_stream_running(self):
+        return self.multi_stream is not None and self.multi_stream.worker.active
+    
+    def close(self):
+        try:
+            self.worker.stop(timeout=5.0)
+            self.count_log.close()  # Commits the frames still queued
+        finally:
+            self.root.destroy()
+    
+    def refresh_controls(self):
+        if self.worker.paused:
+            text = "Resume Video"
+        elif self.worker.active:
+            text = "Pause Video"
+        else:
+            text = "Play Video"
+        if self.play_button.cget("text") != text:
+            self.play_button.config(text=text)
+    
+    def process_video(self, worker):
+        # Trace state starts fresh with every run; the heatmap keeps accumulating until another video is loaded
+        heatmap = self.annotators.get("HeatMap")
+        self.annotators.clear()
+        if heatmap is not None:
+            self.annotators["HeatMap"] = heatmap
+        self.stats.reset()
+        reader = exporter = None
+        try:
+            try:
+                reader = SampledFrameReader(self.video_path, stride=self.sample_stride, target_fps=self.sample_fps)
+                target_fps = self.target_fps or self.sample_fps or reader.source_fps / self.sample_stride
+                batched = self.batch_size > 1 and not self.rois  # ROI crops are already batched per frame
+                letterbox = self.letterbox_input and not self.rois  # ROIs are cropped from the full-resolution source frame
+                multiprocess = self.multiprocess and letterbox and not batched
+                adaptive = not (batched or multiprocess)
+                # Exported models have a fixed input size, so only PyTorch can step it down; the letterboxed
+                # input is already sized for the model, so a smaller imgsz would mean a second resize
+                imgsz_steps = self.imgsz_steps if adaptive and self.model.detector_backend == "torch" and not letterbox else None
+                key = cache_key(self.video_path, self.model_path, self.sample_stride, (900, 750),
+                                sample_fps=self.sample_fps,
+                                tracker="adaptive" if adaptive else "bytetrack",  # Batching leaves the IDs as they are
+                                motion_gate=self.motion_gate and not batched, rois=self.rois, roi_input="source", letterbox=letterbox,
+                                backend=self.model.detector_backend,
+                                # The adaptive path detects at a cadence and input size set by these
+                                target_fps=target_fps if adaptive else None, imgsz_steps=imgsz_steps,
+                                max_stride=self.max_stride if adaptive else None)
+                cached = self.detection_cache.load(key)
+                cache_writer = None if cached is not None else self.detection_cache.writer(key)
+                multiprocess = multiprocess and cached is None
+                if cached is not None:
+                    tracker = cached
+                elif multiprocess:
+                    # The inference process loads its own copy of the model
+                    tracker = functools.partial(person_tracker, self.model_path, self.model.detector_backend, self.motion_gate,
+                                                target_fps)
+                elif batched:
+                    tracker = BatchedPersonTracker(self.model, frame_rate=target_fps).track_batch
+                else:
+                    controller = AdaptiveStrideController(target_fps=target_fps, max_stride=self.max_stride,
+                                                          imgsz_steps=imgsz_steps)
+                    if self.rois:
+                        detector = RoiTracker(self.model, self.rois, frame_rate=target_fps, stats=self.stats)
+                    else:
+                        detector = PersonTracker(self.model, stats=self.stats, frame_rate=target_fps)
+                    if self.motion_gate:
+                        detector = MotionGatedTracker(detector, stats=self.stats)
+                    tracker = AdaptiveTracker(detector, controller)
+                    tracker.reset()
+
+                # Lines and zones are fixed for the run; totals restart with every Play
+                counter = CrossingCounter(self.count_lines, self.count_zones, frame_size=(900, 750))
+
+                def annotate(frame, detections):
+                    # Empty frames too: the heatmap decays and traces age out while nobody is in view
+                    return self.get_annotator().annotate(frame, detections)
 
-        while cap.isOpened() and self.running:
-            ret, frame = cap.read()
-            if not ret:
-                break
+                if self.export_path:
+                    export_fps = self.export_fps or self.sample_fps or reader.source_fps / self.sample_stride
+                    exporter = BackgroundVideoWriter(self.export_path, export_fps, self.export_size or (900, 750),
+                                                     source_fps=reader.source_fps)
 
-            count += 1
-            if count % 3 != 0:
-                continue  # Process every third frame
-            
-            frame = cv2.resize(frame, (900, 750))
-            results = self.model.track(frame, persist=True, classes=0)
-            
-            person_count = 0
-            if results[0].boxes is not None and results[0].boxes.id is not None:
-                boxes = results[0].boxes.xyxy.int().cpu().numpy()
-                class_ids = results[0].boxes.cls.int().cpu().tolist()
-                track_ids = results[0].boxes.id.int().cpu().tolist()
-                
-                detections = sv.Detections(xyxy=boxes, class_id=np.array(class_ids), tracker_id=np.array(track_ids))
-                frame = annotator.annotate(frame, detections)
-                person_count = class_ids.count(0)
-            
-            self.root.after(0, self.display_frame, frame)
-            self.root.after(0, self.update_info_label, person_count)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-        
-        cap.release()
-        cv2.destroyAllWindows()
+                def publish(packet):
+                    counter.update(packet.detections)
+                    counter.draw(packet.frame)
+                    if cache_writer is not None:
+                        cache_writer.add(packet.index, packet.detections)
+                    if exporter is not None:
+                        # Blocks only if the encoder falls behind; shared-memory frames are reused once publish returns
+                        exporter.write(packet.frame.copy() if multiprocess else packet.frame, packet.index / reader.source_fps)
+                    # Colour conversion stays on the worker; the Tk loop only pastes pixels
+                    start = time.perf_counter()
+                    frame = cv2.cvtColor(packet.frame, cv2.COLOR_BGR2RGB)
+                    packet.timings["convert"] = time.perf_counter() - start
+                    person_count, totals = count_persons(packet.detections), counter.totals()
+                    self.count_log.log_frame(self.video_path, packet.index, packet.detections, person_count,
+                                             video_time=packet.index / reader.source_fps, totals=totals)
+                    self.display_mailbox.put(frame, (person_count, totals))
+
+                if multiprocess:
+                    pipeline = ProcessPipeline(self.video_path, tracker, annotate, publish, size=(900, 750),
+                                               stride=self.sample_stride, target_fps=self.sample_fps,
+                                               slots=self.queue_depth * 2, stats=self.stats)
+                else:
+                    preprocess = None
+                    if self.rois and cached is None:
+                        preprocess = SourceFrameInput(display_size=(900, 750))
+                    elif letterbox and cached is None:
+                        preprocess = LetterboxPreprocessor(display_size=(900, 750), pool_size=self.queue_depth + self.batch_size + 2)
+                    pipeline = StagedPipeline(reader, tracker, annotate, publish,
+                                              prepare=lambda frame: cv2.resize(frame, (900, 750)),
+                                              queue_depth=self.queue_depth,
+                                              batch_size=1 if cached is not None else self.batch_size,
+                                              indexed=cached is not None, stats=self.stats, prepare_input=preprocess)
+                completed = worker.run_pipeline(pipeline)
+                if cache_writer is not None and completed:
+                    cache_writer.commit()  # Only complete passes are cached
+            finally:
+                if reader is not None:
+                    reader.release()
+                if exporter is not None:
+                    exporter.close()  # Raises the encoder's error, if it had one
+        except Exception as exc:
+            # Unreadable video, unwritable export path, ...: the worker thread ends, the user is told why
+            self.root.after(0, messagebox.showerror, "Video Error", f"Could not process {os.path.basename(self.video_path)}: {exc}")
+
+    def begin_roi(self, event):
+        self.roi_drag = (event.x, event.y, self.canvas.create_rectangle(event.x, event.y, event.x, event.y, outline="#F1C40F", width=2, dash=(4, 2)))
+    
+    def drag_roi(self, event):
+        if self.roi_drag is not None:
+            x, y, item = self.roi_drag
+            self.canvas.coords(item, x, y, event.x, event.y)
+    
+    def end_roi(self, event):
+        if self.roi_drag is None:
+            return
+        x, y, item = self.roi_drag
+        self.roi_drag = None
+        self.canvas.delete(item)
+        width, height = int(self.canvas.cget("width")), int(self.canvas.cget("height"))
+        try:
+            roi = normalize_roi((x / width, y / height, event.x / width, event.y / height))
+        except ValueError:
+            return  # A click, not a drag
+        if (roi[2] - roi[0]) * width < 16 or (roi[3] - roi[1]) * height < 16:
+            return
+        self.rois.append(roi)
+        self.rois_changed()
     
+    def clear_rois(self):
+        self.rois = []
+        self.rois_changed()
+    
+    def rois_changed(self):
+        save_rois(self.roi_config, self.rois)
+        self.draw_rois()
+        if self.worker.active:  # The running pipeline keeps the areas it started with
+            self.roi_label.config(text=f"{len(self.rois)} detection area(s), applied on the next Play")
+    
+    def draw_rois(self):
+        for item in self.roi_items:
+            self.canvas.delete(item)
+        width, height = int(self.canvas.cget("width")), int(self.canvas.cget("height"))
+        self.roi_items = [self.canvas.create_rectangle(x1 * width, y1 * height, x2 * width, y2 * height, outline="#F1C40F", width=2)
+                          for x1, y1, x2, y2 in self.rois]
+        self.roi_label.config(text=f"{len(self.rois)} detection area(s)" if self.rois else "Drag on the video to add a detection area")
+    
+    def begin_line(self, event):
+        self.line_drag = (event.x, event.y, self.canvas.create_line(event.x, event.y, event.x, event.y, fill="#00FFFF", width=2, dash=(4, 2)))
+    
+    def drag_line(self, event):
+        if self.line_drag is not None:
+            x, y, item = self.line_drag
+            self.canvas.coords(item, x, y, event.x, event.y)
+    
+    def end_line(self, event):
+        if self.line_drag is None:
+            return
+        x, y, item = self.line_drag
+        self.line_drag = None
+        self.canvas.delete(item)
+        if abs(event.x - x) + abs(event.y - y) < 16:
+            return  # A click, not a drag
+        width, height = int(self.canvas.cget("width")), int(self.canvas.cget("height"))
+        self.count_lines.append(normalize_line((x / width, y / height, event.x / width, event.y / height)))
+        self.counting_changed()
+    
+    def clear_lines(self):
+        self.count_lines = []
+        self.counting_changed()
+    
+    def counting_changed(self):
+        save_counting(self.counting_config, self.count_lines, self.count_zones)
+        self.draw_counting()
+        if self.worker.active:  # The running pipeline keeps the lines it started with
+            self.count_config_label.config(text=f"{len(self.count_lines)} counting line(s), applied on the next Play")
+    
+    def draw_counting(self):
+        for item in self.count_items:
+            self.canvas.delete(item)
+        width, height = int(self.canvas.cget("width")), int(self.canvas.cget("height"))
+        self.count_items = [self.canvas.create_line(x1 * width, y1 * height, x2 * width, y2 * height, fill="#00FFFF", width=2, arrow=tk.LAST)
+                            for x1, y1, x2, y2 in self.count_lines]
+        self.count_items += [self.canvas.create_polygon(*[value for x, y in zone for value in (x * width, y * height)], outline="#FF00FF", fill="", width=2)
+                             for zone in self.count_zones]
+        self.count_config_label.config(text=f"{len(self.count_lines)} counting line(s)" if self.count_lines else "Right-drag on the video to add a counting line")
+    
+    def poll_display(self):
+        item = self.display_mailbox.take()
+        if item is not None:
+            frame, (person_count, totals) = item
+            self.display_frame(frame)
+            self.update_info_label(person_count, totals)
+        self.refresh_controls()
+        self.root.after(self.display_refresh_ms, self.poll_display)
+
     def display_frame(self, frame):
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(frame)
-        imgtk = ImageTk.PhotoImage(image=img)
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=imgtk)
-        self.canvas.image = imgtk
+        with self.stats.timer("photo"):
+            img = Image.fromarray(frame)
+            if self.photo is None or (self.photo.width(), self.photo.height()) != img.size:
+                self.photo = ImageTk.PhotoImage(image=img)
+                self.canvas.itemconfig(self.canvas_image, image=self.photo)
+            else:
+                self.photo.paste(img)
+    
+    def refresh_stats(self):
+        self.stats.set("dropped", self.display_mailbox.dropped)
+        if self.worker.active:
+            snapshot = self.stats.snapshot()
+            lines = [f"FPS: {snapshot['fps']:.1f}  Dropped: {self.display_mailbox.dropped}"]
+            if "motion_skipped" in snapshot["counters"]:
+                lines.append(f"YOLO calls: {snapshot['counters'].get('detector_calls', 0)}  Static: {snapshot['counters']['motion_skipped']}")
+            if self.count_log.errors or self.count_log.dropped:
+                lines.append(f"Count log lost: {self.count_log.failed + self.count_log.dropped} frames")
+            lines.append("Stage      p50 / p99 ms")
+            for stage, summary in snapshot["stages"].items():
+                lines.append(f"{stage:<10} {summary['p50_ms']:5.1f} / {summary['p99_ms']:5.1f}")
+            self.stats_label.config(text="\n".join(lines))
+            self.stats_exporter.maybe_write(video=self.video_path, mode=self.annotation_mode)
+        self.root.after(self.stats_refresh_ms, self.refresh_stats)
     
-    def update_info_label(self, count):
+    def update_info_label(self, count, totals):
         self.info_label.config(text=f"Persons Detected: {count}")
+        lines = [f"In: {totals['in']}  Out: {totals['out']}"]
+        lines += [f"Zone {number}: {now} now / {total} total" for number, (now, total) in enumerate(totals["zones"], 1)]
+        self.count_label.config(text="\n".join(lines))
     
     def get_annotator(self):
-        if self.annotation_mode == "Ellips":
-            return sv.EllipseAnnotator()
-        elif self.annotation_mode == "RoundBox":
-            return sv.RoundBoxAnnotator()
-        elif self.annotation_mode == "Triangle":
-            return sv.TriangleAnnotator()
-        elif self.annotation_mode == "HeatMap":
-            return sv.HeatMapAnnotator()
-        elif self.annotation_mode == "Label":
-            return sv.LabelAnnotator()
-        elif self.annotation_mode == "Trace":
-            return sv.TraceAnnotator()
-        elif self.annotation_mode == "Pixelate":
-            return sv.PixelateAnnotator()
-        elif self.annotation_mode == "BoxCorner":
-            return sv.BoxCornerAnnotator()
-        elif self.annotation_mode == "Blur":
-            return sv.BlurAnnotator()
-        elif self.annotation_mode == "Circle":
-            return sv.CircleAnnotator()
-        return sv.BoxCornerAnnotator()
+        mode = self.annotation_mode
+        if mode not in self.annotators:
+            self.annotators[mode] = make_annotator(mode)
+        return self.annotators[mode]
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -1,43 +1,36 @@
 import cv2
-import numpy as np
-from ultralytics import YOLO
-import cvzone
 import supervision as sv
+from detector_backend import load_detector
+from frame_reader import SampledFrameReader
+from frame_skip import build_script_tracker
+from mask_overlay import overlay_detections
 
-# Initialize YOLO model
-model = YOLO("yolo11s.pt")
-names = model.model.names
+# Initialize YOLO model (a -seg model such as yolo11s-seg.pt overlays real masks instead of boxes)
+model = load_detector("yolo11s.pt")  # Set DETECTOR_BACKEND=onnx or openvino for the CPU runtimes
+names = model.names
 
-# OpenCV VideoCapture (Use a video file or webcam)
-cap = cv2.VideoCapture('vidp.mp4')
+# OpenCV VideoCapture (Use a video file or webcam); loops back to the start when the video ends
+reader = SampledFrameReader('vidp.mp4', loop=True)
 
-count = 0
-boxCornerAnnotator = sv.BoxCornerAnnotator()
-mask_annotator = sv.MaskAnnotator()  # MaskAnnotator instance
+# Run YOLO as often as this machine can keep up with the video frame rate (the whole loop counts
+# against the frame budget); boxes come back in display coordinates
+tracker, preprocess = build_script_tracker(model, reader)
 
-while True:
-    
-    # OpenCV: Read frame from video
-    ret, frame = cap.read()
-    if not ret:
-        # Reset to the start of the video if the video ends
-        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-        continue
+boxCornerAnnotator = sv.BoxCornerAnnotator()
 
-    count += 1
-    if count % 3 != 0:
-        continue  # Process every third frame
+for count, frame in reader:
 
+    model_input = preprocess(frame)
     frame = cv2.resize(frame, (1020, 600))
 
-    # YOLO: Run tracking on the frame
-    results = model.track(frame, persist=True, classes=0)
+    # YOLO: Run tracking on the frame (between detections the last tracks are carried forward)
+    detections = model_input.restore(tracker(model_input.image))
 
-    if results[0].boxes is not None and results[0].boxes.id is not None:
+    if len(detections) > 0:
         # Get YOLO detections (bounding boxes, class IDs, track IDs)
-        boxes = results[0].boxes.xyxy.int().cpu().numpy()
-        class_ids = results[0].boxes.cls.int().cpu().tolist()
-        track_ids = results[0].boxes.id.int().cpu().tolist()
+        boxes = detections.xyxy.astype(int)
+        class_ids = detections.class_id.tolist()
+        track_ids = detections.tracker_id.tolist()
 
         # Filter out the person class (class_id == 0)
         person_count = 0
@@ -49,25 +42,11 @@ while True:
         cv2.putText(frame, f"Persons detected: {person_count}", (10, 50), 
                     cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
 
-        # Detections for MaskAnnotator (using bounding boxes as a placeholder)
-        detections = sv.Detections(xyxy=boxes, class_id=np.array(class_ids), 
-                                   tracker_id=np.array(track_ids))
-
         # Annotating with BoxCornerAnnotator
         annotatedFrame = boxCornerAnnotator.annotate(frame, detections)
 
-        # Simulate masks using semi-transparent bounding boxes
-        for box in boxes:
-            x1, y1, x2, y2 = box
-            mask = frame.copy()
-            mask = cv2.rectangle(mask, (x1, y1), (x2, y2), (0, 255, 0), -1)  # Simulate mask with green rectangle
-            frame = cv2.addWeighted(mask, 0.5, frame, 0.5, 0)  # Blend the mask with the original frame
-
-        # Annotating with MaskAnnotator (this works for segmentation masks, here using boxes as placeholders)
-        annotatedFrame = mask_annotator.annotate(
-            scene=frame.copy(),
-            detections=detections
-        )
+        # Overlay masks: one combined mask for all people, blended once over the covered pixels only
+        annotatedFrame = overlay_detections(annotatedFrame, detections, color=(0, 255, 0), alpha=0.5)
 
     # Show the original frame in OpenCV window with annotated bounding boxes and track ID
     cv2.imshow("RGB", annotatedFrame)
@@ -77,5 +56,5 @@ while True:
         break
 
 # Clean up
-cap.release()
+reader.release()
 cv2.destroyAllWindows()
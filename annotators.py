@@ -0,0 +1,22 @@
+import importlib
+
+# Annotation styles offered by the app, in combobox order; each standalone script uses one of them.
+# Values are supervision class names (or "module.Class" for our own annotators) so importing this
+# module does not pull supervision in.
+ANNOTATOR_MODES = {
+    "Ellips": "EllipseAnnotator",
+    "RoundBox": "RoundBoxAnnotator",
+    "Triangle": "TriangleAnnotator",
+    "HeatMap": "heatmap_engine.HeatmapAnnotator",  # Coarse grid that can be saved, merged and exported
+    "Label": "LabelAnnotator",
+    "Trace": "track_history.BoundedTraceAnnotator",  # Fixed memory for sessions that run for days
+    "Pixelate": "PixelateAnnotator",
+    "BoxCorner": "BoxCornerAnnotator",
+    "Circle": "CircleAnnotator",
+    "Blur": "BlurAnnotator",
+}
+
+
+def make_annotator(mode):
+    module, _, name = ANNOTATOR_MODES.get(mode, "BoxCornerAnnotator").rpartition(".")
+    return getattr(importlib.import_module(module or "supervision"), name)()
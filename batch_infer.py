@@ -0,0 +1,10 @@
+from detection import PersonTracker
+
+
+class BatchedPersonTracker(PersonTracker):
+    # Offline detection + tracking: frames are stacked into a single model.predict call and the
+    # ByteTrack is then updated with the results in frame order. Detector and tracker are
+    # PersonTracker's, so the batched and per-frame paths hand out the same tracker IDs.
+    # How many frames go into one call is up to the caller (StagedPipeline's batch_size, the
+    # multi-stream max_batch), which is the only place batch size is set.
+    pass
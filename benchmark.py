@@ -0,0 +1,348 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import supervision as sv
+
+from annotators import ANNOTATOR_MODES, make_annotator
+from frame_reader import SampledFrameReader, parse_size
+from instrumentation import LatencyHistogram, StageStats
+from pipeline import StagedPipeline
+
+BLOB_COLOR = (60, 40, 200)  # BGR colour of the synthetic people, picked up by StubDetector
+BACKGROUND_COLOR = (90, 110, 100)
+
+
+def make_synthetic_video(path, width=1280, height=720, frames=300, fps=30, people=20, seed=0):
+    # Person-shaped blobs (head + body) walking across a static background, bouncing off the edges
+    rng = np.random.default_rng(seed)
+    body = np.stack([rng.uniform(12, 24, people), rng.uniform(30, 60, people)], axis=1) * (height / 720)
+    position = np.stack([rng.uniform(0, width, people), rng.uniform(0, height, people)], axis=1)
+    velocity = rng.uniform(-4, 4, (people, 2)) * (height / 720)
+
+    background = np.empty((height, width, 3), dtype=np.uint8)
+    background[:] = BACKGROUND_COLOR
+    cv2.rectangle(background, (0, int(height * 0.75)), (width, height), (70, 80, 75), -1)  # Floor
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    try:
+        for _ in range(frames):
+            frame = background.copy()
+            for (x, y), (half_width, half_height) in zip(position, body):
+                center = (int(x), int(y))
+                cv2.ellipse(frame, center, (int(half_width), int(half_height)), 0, 0, 360, BLOB_COLOR, -1)
+                head = (int(x), int(y - half_height - half_width * 0.6))
+                cv2.circle(frame, head, int(half_width * 0.7), BLOB_COLOR, -1)
+            writer.write(frame)
+
+            position += velocity
+            bounced = (position < 0) | (position > [width, height])
+            velocity[bounced] *= -1
+            position = np.clip(position, 0, [width, height])
+    finally:
+        writer.release()
+    return path
+
+
+class StubDetector:
+    # Deterministic stand-in for YOLO tracking on synthetic videos: colour threshold +
+    # connected components for the boxes, supervision's ByteTrack for the IDs.
+    def __init__(self, min_area=60, frame_rate=30):
+        self.min_area = min_area
+        self.frame_rate = frame_rate
+        self.byte_track = sv.ByteTrack(frame_rate=int(round(frame_rate)))
+        self.lower = np.clip(np.array(BLOB_COLOR) - 30, 0, 255).astype(np.uint8)
+        self.upper = np.clip(np.array(BLOB_COLOR) + 30, 0, 255).astype(np.uint8)
+
+    def detect(self, frame):
+        mask = cv2.inRange(frame, self.lower, self.upper)
+        count, _, components, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        components = components[1:count]  # Row 0 is the background
+        components = components[components[:, cv2.CC_STAT_AREA] >= self.min_area]
+        x, y = components[:, cv2.CC_STAT_LEFT], components[:, cv2.CC_STAT_TOP]
+        xyxy = np.stack([x, y, x + components[:, cv2.CC_STAT_WIDTH], y + components[:, cv2.CC_STAT_HEIGHT]], axis=1)
+        return sv.Detections(
+            xyxy=xyxy.astype(np.float32).reshape(-1, 4),
+            class_id=np.zeros(len(xyxy), dtype=int),
+            confidence=np.ones(len(xyxy), dtype=np.float32),
+        )
+
+    def __call__(self, frame):
+        return self.byte_track.update_with_detections(self.detect(frame))
+
+    def track_batch(self, frames):
+        # Same interface as BatchedPersonTracker.track_batch
+        return [self(frame) for frame in frames]
+
+    def reset(self):
+        self.byte_track = sv.ByteTrack(frame_rate=int(round(self.frame_rate)))
+
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # No procfs: fall back to the lifetime peak (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageBenchmark:
+    # Latency histogram, throughput and peak RSS (sampled every few frames) for one stage
+    def __init__(self, name, rss_every=10):
+        self.name = name
+        self.histogram = LatencyHistogram()
+        self.rss_every = rss_every
+        self.peak_rss = current_rss_bytes()
+        self.elapsed = 0.0
+
+    def measure(self, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+        self.histogram.record(seconds)
+        self.elapsed += seconds
+        if self.histogram.count % self.rss_every == 0:
+            self.peak_rss = max(self.peak_rss, current_rss_bytes())
+        return result
+
+    def report(self):
+        summary = self.histogram.summary()
+        return {
+            "stage": self.name,
+            "frames": summary["count"],
+            "fps": round(summary["count"] / self.elapsed, 2) if self.elapsed else 0.0,
+            "p50_ms": summary["p50_ms"],
+            "p99_ms": summary["p99_ms"],
+            "peak_rss_mb": round(self.peak_rss / 2 ** 20, 1),
+        }
+
+
+def make_tracker(name, frame_rate, backend=None):
+    if name == "stub":
+        return StubDetector(frame_rate=frame_rate)
+    from detection import PersonTracker
+    from detector_backend import load_detector
+    return PersonTracker(load_detector(name, backend=backend), frame_rate=frame_rate)
+
+
+def prepared_frames(video_path, size):
+    with SampledFrameReader(video_path) as reader:
+        for _, frame in reader:
+            yield cv2.resize(frame, size)
+
+
+def benchmark_stages(video_path, detector_name="stub", size=(1020, 600), modes=None, backend=None):
+    # Each stage gets its own pass over the video so its cost is not hidden by the others;
+    # frames are re-decoded per pass instead of being held in memory
+    modes = list(modes or ANNOTATOR_MODES)
+    results = []
+
+    decode = StageBenchmark("decode")
+    prepare = StageBenchmark("prepare")
+    with SampledFrameReader(video_path) as reader:
+        frame_rate = int(round(reader.source_fps))
+        iterator = iter(reader)
+        while True:
+            item = decode.measure(next, iterator, None)
+            if item is None:
+                break
+            prepare.measure(cv2.resize, item[1], size)
+    results += [decode.report(), prepare.report()]
+
+    detector = make_tracker(detector_name, frame_rate, backend)
+    detect = StageBenchmark(f"detect[{detector_name}]")
+    detections = [detect.measure(detector, frame) for frame in prepared_frames(video_path, size)]
+    results.append(detect.report())
+
+    for mode in modes:
+        annotator = make_annotator(mode)
+        annotate = StageBenchmark(f"annotate[{mode}]")
+        for frame, frame_detections in zip(prepared_frames(video_path, size), detections):
+            annotate.measure(annotator.annotate, frame, frame_detections)
+        results.append(annotate.report())
+    return results
+
+
+def benchmark_pipeline(video_path, detector_name="stub", size=(1020, 600), mode="BoxCorner", queue_depth=4,
+                       backend=None):
+    # End-to-end throughput of the staged pipeline the desktop app uses
+    reader = SampledFrameReader(video_path)
+    detector = make_tracker(detector_name, int(round(reader.source_fps)), backend)
+    annotator = make_annotator(mode)
+    stats = StageStats()
+    pipeline = StagedPipeline(reader, detector, annotator.annotate, lambda packet: None,
+                              prepare=lambda frame: cv2.resize(frame, size),
+                              queue_depth=queue_depth, stats=stats)
+    start = time.perf_counter()
+    try:
+        pipeline.run()
+    finally:
+        reader.release()
+    elapsed = time.perf_counter() - start
+    snapshot = stats.snapshot()
+    return {
+        "stage": f"pipeline[{mode}]",
+        "frames": snapshot["counters"].get("frames", 0),
+        "fps": round(snapshot["counters"].get("frames", 0) / elapsed, 2) if elapsed else 0.0,
+        "stages": snapshot["stages"],
+        "peak_rss_mb": round(current_rss_bytes() / 2 ** 20, 1),
+    }
+
+
+def soak(video_path, detector_name="stub", size=(1020, 600), modes=("Trace", "HeatMap"), minutes=10.0,
+         interval=10.0, backend=None):
+    # Loops the video the way heat.py / tracee.py do and samples RSS every `interval` seconds,
+    # so per-track state that keeps growing shows up as a rising curve
+    reader = SampledFrameReader(video_path, loop=True)
+    detector = make_tracker(detector_name, int(round(reader.source_fps)), backend)
+    annotators = [make_annotator(mode) for mode in modes]
+    samples = []
+    frames = 0
+    start = next_sample = time.perf_counter()
+    try:
+        for _, frame in reader:
+            frame = cv2.resize(frame, size)
+            detections = detector(frame)
+            for annotator in annotators:
+                annotator.annotate(frame, detections)
+            frames += 1
+            now = time.perf_counter()
+            if now >= next_sample:
+                samples.append({
+                    "elapsed_s": round(now - start, 1),
+                    "frames": frames,
+                    "rss_mb": round(current_rss_bytes() / 2 ** 20, 1),
+                    "max_tracker_id": int(detections.tracker_id.max()) if len(detections) else None,
+                })
+                next_sample += interval
+            if now - start >= minutes * 60:
+                break
+    finally:
+        reader.release()
+    # Growth after the first sample, which already includes imports and warm-up
+    return {"modes": list(modes), "samples": samples,
+            "rss_growth_mb": round(samples[-1]["rss_mb"] - samples[0]["rss_mb"], 1) if samples else 0.0}
+
+
+_STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import DesktopApp5
+timings = {"app_import_s": time.perf_counter() - start}
+if sys.argv[1] != "stub":
+    import numpy as np
+    from detector_backend import load_detector
+    start = time.perf_counter()
+    model = load_detector(sys.argv[1], backend=sys.argv[2] or None)
+    timings["model_load_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    model.predict(np.zeros((750, 900, 3), dtype=np.uint8), classes=0, verbose=False)
+    timings["warmup_s"] = time.perf_counter() - start
+print(json.dumps({key: round(value, 3) for key, value in timings.items()}))
+"""
+
+
+def measure_startup(detector_name="stub", backend=None):
+    # Cold start in a fresh interpreter: importing the desktop app, then (for a YOLO detector)
+    # what its background thread does before Play is enabled
+    process = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT, detector_name, backend or ""],
+                             cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+    if process.returncode != 0:
+        return {"error": process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "failed"}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "supervision": getattr(sv, "__version__", "unknown"),
+    }
+
+
+def run_soak(args):
+    with tempfile.TemporaryDirectory() as scratch:
+        video_path = args.video
+        if video_path is None:
+            width, height = args.resolution
+            video_path = make_synthetic_video(os.path.join(scratch, "synthetic.mp4"), width, height,
+                                              args.frames, args.fps, args.people, args.seed)
+        modes = [mode for mode in args.modes if mode in ("Trace", "HeatMap")] or args.modes
+        report = {
+            "created": time.time(),
+            "environment": environment(),
+            "config": {key: value for key, value in vars(args).items() if key != "output"},
+            "soak": soak(video_path, args.detector, args.size, modes, args.soak_minutes, args.soak_interval,
+                         backend=args.backend),
+        }
+
+    with open(args.output, "w") as handle:
+        json.dump(report, handle, indent=2)
+    for sample in report["soak"]["samples"]:
+        print(f"{sample['elapsed_s']:8.1f} s  {sample['frames']:8d} frames  rss {sample['rss_mb']:7.1f} MB  "
+              f"max id {sample['max_tracker_id']}")
+    print(f"RSS growth {report['soak']['rss_growth_mb']} MB; results written to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproducible per-stage benchmark on a synthetic crowd video")
+    parser.add_argument("--video", help="Benchmark this video instead of generating one")
+    parser.add_argument("--resolution", type=parse_size, default=(1280, 720), help="Synthetic video WIDTHxHEIGHT")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--people", type=int, default=20, help="Crowd density of the synthetic video")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--detector", default="stub", help="'stub' or a YOLO weights file such as yolo11s.pt")
+    parser.add_argument("--backend", choices=("torch", "onnx", "openvino"), help="Runtime for a YOLO --detector")
+    parser.add_argument("--size", type=parse_size, default=(1020, 600), help="Processing WIDTHxHEIGHT")
+    parser.add_argument("--modes", nargs="+", default=list(ANNOTATOR_MODES), choices=list(ANNOTATOR_MODES))
+    parser.add_argument("--soak-minutes", type=float, help="Instead of the stage benchmark, loop the video this "
+                                                                "long and report RSS over time")
+    parser.add_argument("--soak-interval", type=float, default=10.0, help="Seconds between soak RSS samples")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    if args.soak_minutes:
+        run_soak(args)
+        return
+
+    with tempfile.TemporaryDirectory() as scratch:
+        video_path = args.video
+        if video_path is None:
+            width, height = args.resolution
+            video_path = make_synthetic_video(os.path.join(scratch, "synthetic.mp4"), width, height,
+                                              args.frames, args.fps, args.people, args.seed)
+        report = {
+            "created": time.time(),
+            "environment": environment(),
+            "config": {key: value for key, value in vars(args).items() if key != "output"},
+            "stages": benchmark_stages(video_path, args.detector, args.size, args.modes, backend=args.backend),
+            "pipeline": benchmark_pipeline(video_path, args.detector, args.size, backend=args.backend),
+            "startup": measure_startup(args.detector, args.backend),
+        }
+
+    with open(args.output, "w") as handle:
+        json.dump(report, handle, indent=2)
+
+    for row in report["stages"] + [report["pipeline"]]:
+        print(f"{row['stage']:<24} {row['fps']:8.1f} fps  p50 {row.get('p50_ms', 0):7.2f} ms  "
+              f"p99 {row.get('p99_ms', 0):7.2f} ms  rss {row['peak_rss_mb']:7.1f} MB")
+    print("startup " + "  ".join(f"{key} {value}" for key, value in report["startup"].items()))
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
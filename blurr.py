@@ -1,42 +1,36 @@
 import cv2
 import numpy as np
-from ultralytics import YOLO
-import cvzone
 import supervision as sv
+from detector_backend import load_detector
+from frame_reader import SampledFrameReader
+from frame_skip import build_script_tracker
 
 # Initialize YOLO model
-model = YOLO("yolo11s.pt")
-names = model.model.names
+model = load_detector("yolo11s.pt")  # Set DETECTOR_BACKEND=onnx or openvino for the CPU runtimes
+names = model.names
 
-# OpenCV VideoCapture (Use a video file or webcam)
-cap = cv2.VideoCapture('vidp.mp4')
+# OpenCV VideoCapture (Use a video file or webcam); loops back to the start when the video ends
+reader = SampledFrameReader('vidp.mp4', loop=True)
 
-count = 0
-boxCornerAnnotator = sv.BlurAnnotator()
+# Run YOLO as often as this machine can keep up with the video frame rate (the whole loop counts
+# against the frame budget); boxes come back in display coordinates
+tracker, preprocess = build_script_tracker(model, reader)
 
-while True:
-    
-    # OpenCV: Read frame from video
-    ret, frame = cap.read()
-    if not ret:
-        # Reset to the start of the video if the video ends
-        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-        continue
+boxCornerAnnotator = sv.BlurAnnotator()
 
-    count += 1
-    if count % 3 != 0:
-        continue  # Process every third frame
+for count, frame in reader:
 
+    model_input = preprocess(frame)
     frame = cv2.resize(frame, (1020, 600))
 
-    # YOLO: Run tracking on the frame
-    results = model.track(frame, persist=True, classes=0)
+    # YOLO: Run tracking on the frame (between detections the last tracks are carried forward)
+    detections = model_input.restore(tracker(model_input.image))
 
-    if results[0].boxes is not None and results[0].boxes.id is not None:
+    if len(detections) > 0:
         # Get YOLO detections (bounding boxes, class IDs, track IDs)
-        boxes = results[0].boxes.xyxy.int().cpu().numpy()
-        class_ids = results[0].boxes.cls.int().cpu().tolist()
-        track_ids = results[0].boxes.id.int().cpu().tolist()
+        boxes = detections.xyxy.astype(int)
+        class_ids = detections.class_id.tolist()
+        track_ids = detections.tracker_id.tolist()
 
         # Filter out the person class (class_id == 0)
         person_count = 0
@@ -67,6 +61,6 @@ while True:
         break
 
 # Clean up
-cap.release()
+reader.release()
 cv2.destroyAllWindows()
 
@@ -0,0 +1,225 @@
+import argparse
+import contextlib
+import json
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+_CLOSE = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    source TEXT NOT NULL,
+    frame_index INTEGER NOT NULL,
+    time REAL NOT NULL,          -- Wall clock (Unix seconds) when the frame was processed
+    video_time REAL,             -- Position in the source, in seconds
+    persons INTEGER NOT NULL,
+    line_in INTEGER,             -- Running line-crossing totals, when counting lines are set
+    line_out INTEGER
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    source TEXT NOT NULL,
+    frame_index INTEGER NOT NULL,
+    time REAL NOT NULL,
+    video_time REAL,
+    tracker_id INTEGER,
+    class_id INTEGER,
+    confidence REAL,
+    x1 REAL, y1 REAL, x2 REAL, y2 REAL
+);
+CREATE INDEX IF NOT EXISTS frames_source_time ON frames (source, time);
+CREATE INDEX IF NOT EXISTS frames_source_video_time ON frames (source, video_time);
+CREATE INDEX IF NOT EXISTS tracks_source_time ON tracks (source, time);
+CREATE INDEX IF NOT EXISTS tracks_source_video_time ON tracks (source, video_time);
+"""
+
+CLOCKS = ("time", "video_time")  # Columns range queries and rollups can run on
+
+
+class CountLog:
+    # Append-only log of per-frame person counts and per-track boxes in SQLite (WAL mode).
+    # log_frame() only queues references to the detection arrays; a writer thread turns them
+    # into rows and commits them in batches of up to `batch_size` frames or every
+    # `flush_interval` seconds, so the pipeline never waits for the disk. If the writer falls
+    # `queue_depth` frames behind, further frames are dropped and counted rather than blocking.
+    # A failed write (disk full, database locked) loses that batch only: it is reported once on
+    # stderr and counted in `errors`/`failed`, and logging never raises into the pipeline.
+    # Readers use their own connections, which WAL lets run while the writer appends.
+    def __init__(self, path="counts.sqlite", batch_size=256, flush_interval=1.0, queue_depth=10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logged = 0
+        self.dropped = 0
+        self.errors = 0  # Failed batch writes
+        self.failed = 0  # Frames lost in them
+        self.error = None  # Last write failure
+        connection = sqlite3.connect(path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA)
+        connection.close()
+        self._queue = queue.Queue(maxsize=queue_depth)
+        self._thread = threading.Thread(target=self._write, name=f"count-log-{path}", daemon=True)
+        self._thread.start()
+
+    def log_frame(self, source, frame_index, detections, person_count, video_time=None, totals=None,
+                  timestamp=None):
+        # `totals` is CrossingCounter.totals(); the detections must not be modified afterwards
+        totals = totals or {}
+        item = (str(source), int(frame_index), time.time() if timestamp is None else timestamp, video_time,
+                int(person_count), totals.get("in"), totals.get("out"), detections)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_CLOSE)
+            self._thread.join()
+
+    def _write(self):
+        connection = None
+        closing = False
+        while not closing:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.001))
+                except queue.Empty:
+                    break
+                if item is _CLOSE:
+                    closing = True
+                    break
+                batch.append(item)
+            if not batch:
+                continue
+            try:
+                if connection is None:
+                    connection = sqlite3.connect(self.path)
+                    connection.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent; only the last commits can be lost
+                self._commit(connection, batch)
+            except Exception as exc:
+                self._report(exc, len(batch))
+        if connection is not None:
+            connection.close()
+
+    def _report(self, exc, frames):
+        if self.errors == 0:
+            print(f"Count log {self.path}: {exc!r}; frames are dropped while writes fail", file=sys.stderr)
+        self.errors += 1
+        self.failed += frames
+        self.error = exc
+
+    def _commit(self, connection, batch):
+        frames, tracks = [], []
+        for source, frame_index, timestamp, video_time, persons, line_in, line_out, detections in batch:
+            frames.append((source, frame_index, timestamp, video_time, persons, line_in, line_out))
+            if len(detections) == 0:
+                continue
+            count = len(detections)
+            tracker_ids = detections.tracker_id if detections.tracker_id is not None else np.full(count, -1)
+            class_ids = detections.class_id if detections.class_id is not None else np.full(count, -1)
+            confidence = detections.confidence if detections.confidence is not None else np.full(count, np.nan)
+            tracks.extend(
+                (source, frame_index, timestamp, video_time, tracker_id, class_id,
+                 None if confidence != confidence else confidence, x1, y1, x2, y2)
+                for tracker_id, class_id, confidence, (x1, y1, x2, y2) in zip(
+                    np.asarray(tracker_ids).tolist(), np.asarray(class_ids).tolist(),
+                    np.asarray(confidence, dtype=np.float64).tolist(), np.asarray(detections.xyxy).tolist()))
+        with connection:  # One transaction per batch
+            connection.executemany("INSERT INTO frames VALUES (?, ?, ?, ?, ?, ?, ?)", frames)
+            connection.executemany("INSERT INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", tracks)
+        self.logged += len(batch)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _connect(path):
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    connection.row_factory = sqlite3.Row
+    return contextlib.closing(connection)
+
+
+def _range(source, start, end, clock):
+    if clock not in CLOCKS:
+        raise ValueError(f"clock must be one of {CLOCKS}")
+    conditions, parameters = [f"{clock} IS NOT NULL"], []
+    if source is not None:
+        conditions.append("source = ?")
+        parameters.append(source)
+    if start is not None:
+        conditions.append(f"{clock} >= ?")
+        parameters.append(start)
+    if end is not None:
+        conditions.append(f"{clock} < ?")
+        parameters.append(end)
+    return " AND ".join(conditions), parameters
+
+
+def query_frames(path, source=None, start=None, end=None, clock="time"):
+    # Per-frame rows with start <= clock < end, in time order
+    where, parameters = _range(source, start, end, clock)
+    with _connect(path) as connection:
+        return [dict(row) for row in
+                connection.execute(f"SELECT * FROM frames WHERE {where} ORDER BY {clock}", parameters)]
+
+
+def query_tracks(path, source=None, start=None, end=None, clock="time", tracker_id=None):
+    where, parameters = _range(source, start, end, clock)
+    if tracker_id is not None:
+        where += " AND tracker_id = ?"
+        parameters.append(tracker_id)
+    with _connect(path) as connection:
+        return [dict(row) for row in
+                connection.execute(f"SELECT * FROM tracks WHERE {where} ORDER BY {clock}", parameters)]
+
+
+def rollup(path, bucket=60.0, source=None, start=None, end=None, clock="time"):
+    # Downsampled series for charts: one row per `bucket` seconds (1 for per-second, 60 for per-minute)
+    # with the frame count, mean and peak persons, line totals at the end of the bucket and the number
+    # of different tracks seen in it
+    where, parameters = _range(source, start, end, clock)
+    with _connect(path) as connection:
+        rows = connection.execute(
+            f"SELECT CAST({clock} / ? AS INTEGER) * ? AS bucket, COUNT(*) AS frames, AVG(persons) AS mean_persons,"
+            f" MAX(persons) AS max_persons, MAX(line_in) AS line_in, MAX(line_out) AS line_out"
+            f" FROM frames WHERE {where} GROUP BY 1 ORDER BY 1", [bucket, bucket] + parameters).fetchall()
+        unique = dict(connection.execute(
+            f"SELECT CAST({clock} / ? AS INTEGER) * ? AS bucket, COUNT(DISTINCT tracker_id)"
+            f" FROM tracks WHERE {where} AND tracker_id >= 0 GROUP BY 1", [bucket, bucket] + parameters).fetchall())
+    series = []
+    for row in rows:
+        row = dict(row)
+        row["mean_persons"] = round(row["mean_persons"], 2)
+        row["unique_tracks"] = unique.get(row["bucket"], 0)
+        series.append(row)
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-second or per-minute rollups from a count log")
+    parser.add_argument("log", help="SQLite file written by the app, render_all.py or multi_stream.py")
+    parser.add_argument("--source", help="Video path or stream name (default: all sources)")
+    parser.add_argument("--bucket", type=float, default=60.0, help="Seconds per row (1 = per second, 60 = per minute)")
+    parser.add_argument("--start", type=float, help="Range start in seconds on the chosen clock")
+    parser.add_argument("--end", type=float, help="Range end in seconds on the chosen clock")
+    parser.add_argument("--clock", default="time", choices=CLOCKS,
+                        help="'time' (wall clock, Unix seconds) or 'video_time' (position in the video)")
+    args = parser.parse_args()
+
+    for row in rollup(args.log, args.bucket, args.source, args.start, args.end, args.clock):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
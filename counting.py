@@ -0,0 +1,194 @@
+import json
+
+import cv2
+import numpy as np
+
+# Lines are (x1, y1, x2, y2) and zones lists of (x, y) points, as frame fractions like the ROIs,
+# so the same config works at any resolution. People are placed at the bottom centre of their box.
+
+
+def anchor_points(detections):
+    xyxy = detections.xyxy
+    return np.stack([(xyxy[:, 0] + xyxy[:, 2]) / 2, xyxy[:, 3]], axis=1)
+
+
+def predicted_rows(detections):
+    # Boxes BoxPredictor extrapolated on frames the detector skipped. They are drawn, but never move
+    # counter state: a prediction carried across a line and snapped back would count a crossing twice.
+    flags = detections.data.get("predicted") if len(detections) else None
+    return np.zeros(len(detections), dtype=bool) if flags is None else np.asarray(flags, dtype=bool)
+
+
+def _tracked(detections):
+    # (tracker IDs, anchor points) of the detected (not predicted) boxes that have an ID
+    if detections.tracker_id is None or len(detections) == 0:
+        return np.empty(0, dtype=np.int64), np.empty((0, 2), dtype=np.float32)
+    track_ids = np.asarray(detections.tracker_id, dtype=np.int64)
+    keep = (track_ids >= 0) & ~predicted_rows(detections)
+    return track_ids[keep], anchor_points(detections)[keep]
+
+
+class LineCounter:
+    # Counts tracks crossing a line segment: "in" from its left-hand side to its right (as seen on
+    # screen walking from the first point to the second, so downwards for a line drawn left to
+    # right), "out" the other way. The last side of every track lives in arrays sorted by tracker
+    # ID, so a frame is one searchsorted plus array arithmetic however many people are tracked.
+    # Tracks not seen for `idle_frames` are dropped.
+    def __init__(self, line, frame_size, idle_frames=150):
+        width, height = frame_size
+        x1, y1, x2, y2 = line
+        self.line = tuple(line)
+        self.start = np.array([x1 * width, y1 * height], dtype=np.float32)
+        self.direction = np.array([(x2 - x1) * width, (y2 - y1) * height], dtype=np.float32)
+        self.idle_frames = idle_frames
+        self.reset()
+
+    def reset(self):
+        self.track_ids = np.empty(0, dtype=np.int64)  # Sorted
+        self.sides = np.empty(0, dtype=np.int8)       # -1 / +1: last side of the line seen, 0: not yet
+        self.last_seen = np.empty(0, dtype=np.int64)
+        self.frame = 0
+        self.in_count = 0
+        self.out_count = 0
+
+    def sides_of(self, points):
+        # +1 left of the line, -1 right (on screen, y pointing down), 0 on it or beyond its ends
+        relative = points - self.start
+        cross = relative[:, 0] * self.direction[1] - relative[:, 1] * self.direction[0]
+        along = relative @ self.direction / max(float(self.direction @ self.direction), 1e-9)
+        return np.where((along >= 0) & (along <= 1), np.sign(cross), 0).astype(np.int8)
+
+    def update(self, detections):
+        # Returns (in, out) crossings on this frame
+        track_ids, points = _tracked(detections)
+        sides = self.sides_of(points)
+        position = np.searchsorted(self.track_ids, track_ids)
+        known = position < len(self.track_ids)
+        known[known] = self.track_ids[position[known]] == track_ids[known]
+
+        rows, current = position[known], sides[known]
+        previous = self.sides[rows]
+        crossed = (previous != 0) & (current != 0) & (previous != current)
+        entered = int(np.count_nonzero(crossed & (current < 0)))
+        exited = int(np.count_nonzero(crossed & (current > 0)))
+        self.in_count += entered
+        self.out_count += exited
+        self.sides[rows] = np.where(current != 0, current, previous)
+        self.last_seen[rows] = self.frame
+
+        new = ~known
+        if new.any():
+            track_ids = np.concatenate([self.track_ids, track_ids[new]])
+            order = np.argsort(track_ids, kind="stable")
+            self.track_ids = track_ids[order]
+            self.sides = np.concatenate([self.sides, sides[new]])[order]
+            self.last_seen = np.concatenate([self.last_seen, np.full(np.count_nonzero(new), self.frame)])[order]
+        live = self.frame - self.last_seen <= self.idle_frames
+        if not live.all():
+            self.track_ids, self.sides, self.last_seen = self.track_ids[live], self.sides[live], self.last_seen[live]
+        self.frame += 1
+        return entered, exited
+
+    def draw(self, scene, color=(0, 255, 255)):
+        start = self.start.round().astype(int)
+        end = (self.start + self.direction).round().astype(int)
+        cv2.line(scene, tuple(start.tolist()), tuple(end.tolist()), color, 2, cv2.LINE_AA)
+        cv2.putText(scene, f"In {self.in_count}  Out {self.out_count}", tuple((start + [5, -8]).tolist()),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2, cv2.LINE_AA)
+        return scene
+
+
+class ZoneCounter:
+    # Occupancy of a polygon: people inside it now, and how many different tracks have been inside.
+    # The polygon is rasterised once into a mask over its bounding box, so testing every anchor
+    # point is a single fancy-indexing lookup.
+    def __init__(self, polygon, frame_size):
+        width, height = frame_size
+        self.polygon = [tuple(point) for point in polygon]
+        self.points = np.round(np.array(self.polygon, dtype=np.float64) * [width, height]).astype(np.int32)
+        self.origin = self.points.min(axis=0)
+        extent = self.points.max(axis=0) - self.origin + 1
+        self.mask = np.zeros((extent[1], extent[0]), dtype=bool)
+        cv2.fillPoly(self.mask.view(np.uint8), [self.points - self.origin], 1)
+        self.reset()
+
+    def reset(self):
+        self.occupancy = 0
+        self.visitors = np.empty(0, dtype=np.int64)  # Sorted IDs of every track seen inside
+
+    def contains(self, points):
+        cells = np.floor(points).astype(np.int64) - self.origin
+        inside = (cells >= 0).all(axis=1) & (cells[:, 0] < self.mask.shape[1]) & (cells[:, 1] < self.mask.shape[0])
+        inside[inside] = self.mask[cells[inside, 1], cells[inside, 0]]
+        return inside
+
+    def update(self, detections):
+        if len(detections) and predicted_rows(detections).all():
+            return self.occupancy  # Nothing measured on this frame
+        track_ids, points = _tracked(detections)
+        inside = self.contains(points)
+        self.occupancy = int(np.count_nonzero(inside))
+        self.visitors = np.union1d(self.visitors, track_ids[inside])
+        return self.occupancy
+
+    @property
+    def total(self):
+        return len(self.visitors)
+
+    def draw(self, scene, color=(255, 0, 255)):
+        cv2.polylines(scene, [self.points], True, color, 2, cv2.LINE_AA)
+        cv2.putText(scene, f"{self.occupancy} now / {self.total} total", tuple((self.origin + [5, 20]).tolist()),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2, cv2.LINE_AA)
+        return scene
+
+
+class CrossingCounter:
+    # Every configured line and zone, updated together once per frame
+    def __init__(self, lines=(), zones=(), frame_size=(900, 750), idle_frames=150):
+        self.lines = [LineCounter(line, frame_size, idle_frames) for line in lines]
+        self.zones = [ZoneCounter(zone, frame_size) for zone in zones]
+
+    def __bool__(self):
+        return bool(self.lines or self.zones)
+
+    def update(self, detections):
+        for counter in self.lines + self.zones:
+            counter.update(detections)
+
+    def totals(self):
+        return {
+            "in": sum(line.in_count for line in self.lines),
+            "out": sum(line.out_count for line in self.lines),
+            "zones": [(zone.occupancy, zone.total) for zone in self.zones],
+        }
+
+    def draw(self, scene):
+        for counter in self.lines + self.zones:
+            counter.draw(scene)
+        return scene
+
+    def reset(self):
+        for counter in self.lines + self.zones:
+            counter.reset()
+
+
+def normalize_line(line):
+    line = tuple(min(max(float(value), 0.0), 1.0) for value in line)
+    if len(line) != 4 or line[:2] == line[2:]:
+        raise ValueError(f"Not a line: {line}")
+    return line
+
+
+def load_counting(path):
+    # {"lines": [[x1, y1, x2, y2], ...], "zones": [[[x, y], ...], ...]}
+    with open(path) as handle:
+        config = json.load(handle)
+    lines = [normalize_line(line) for line in config.get("lines", [])]
+    zones = [[tuple(point) for point in zone] for zone in config.get("zones", [])]
+    return lines, zones
+
+
+def save_counting(path, lines, zones):
+    with open(path, "w") as handle:
+        json.dump({"lines": [list(line) for line in lines], "zones": [[list(point) for point in zone] for zone in zones]},
+                  handle, indent=2)
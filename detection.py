@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+
+PERSON_CLASS_ID = 0  # Class ID 0 is "person" in YOLO
+
+
+def count_persons(detections):
+    if detections.class_id is None:
+        return 0
+    return int(np.count_nonzero(detections.class_id == PERSON_CLASS_ID))
+
+
+def tracker_callbacks(model):
+    # Callbacks model.track() leaves on an ultralytics model; they cannot be removed and route every
+    # later predict on that model through one shared tracker
+    callbacks = getattr(model, "callbacks", None) or {}
+    return [callback for event in ("on_predict_start", "on_predict_postprocess_end")
+            for callback in callbacks.get(event, [])
+            if getattr(getattr(callback, "func", callback), "__module__", "").startswith("ultralytics.trackers")]
+
+
+def require_predict_only(model):
+    if tracker_callbacks(model):
+        raise ValueError("model.track() has been called on this model, so its predictions go through ultralytics' "
+                         "tracker; load a fresh model for this detector")
+
+
+class PersonTracker:
+    # YOLO person detection (model.predict) followed by a standalone ByteTrack, one frame per call.
+    # model.track is not used: it installs ultralytics' tracker callbacks on the model for good,
+    # after which every predict on that model (batches, ROI crops, other streams) would also be
+    # pushed through that one shared tracker.
+    def __init__(self, model, imgsz=None, stats=None, frame_rate=30):
+        import supervision as sv
+
+        require_predict_only(model)
+        self.model = model
+        self.imgsz = imgsz  # Model input size; None keeps the model default
+        self.stats = stats  # Optional StageStats: splits the call into inference and tracking time
+        self.byte_track = sv.ByteTrack(frame_rate=int(round(frame_rate)))
+
+    def detect_batch(self, frames):
+        import supervision as sv
+
+        options = {} if self.imgsz is None else {"imgsz": self.imgsz}
+        results = self.model.predict(list(frames), classes=PERSON_CLASS_ID, verbose=False, **options)
+        return [sv.Detections.from_ultralytics(result) for result in results]
+
+    def track_batch(self, frames):
+        # The tracker is updated in frame order, so IDs do not depend on how frames were batched
+        start = time.perf_counter()
+        detections = self.detect_batch(frames)
+        detected = time.perf_counter()
+        tracked = [self.byte_track.update_with_detections(frame_detections) for frame_detections in detections]
+        if self.stats is not None:
+            self.stats.record("inference", detected - start)
+            self.stats.record("tracking", time.perf_counter() - detected)
+        return tracked
+
+    def __call__(self, frame):
+        return self.track_batch([frame])[0]
+
+    def reset(self):
+        # Forget tracks from a previous run so IDs start fresh for the next video
+        self.byte_track.reset()
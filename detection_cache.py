@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "person-counter", "detections")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+CACHE_FORMAT = 2  # Part of every key; bumped when the stored columns change so older entries are not replayed
+
+_digests = {}  # (path, size, mtime) -> content digest, so a file is only hashed once per session
+
+
+def file_digest(path, chunk_size=1 << 20):
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _digests:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as handle:
+            for chunk in iter(lambda: handle.read(chunk_size), b""):
+                digest.update(chunk)
+        _digests[memo_key] = digest.hexdigest()
+    return _digests[memo_key]
+
+
+def cache_key(video_path, model_path, stride, size, **params):
+    # Video content + model weights + every parameter that changes which detections come out
+    parts = {
+        "video": file_digest(video_path),
+        "model": file_digest(model_path) if os.path.isfile(model_path) else model_path,
+        "stride": stride,
+        "size": list(size),
+        "format": CACHE_FORMAT,
+    }
+    parts.update(params)
+    return hashlib.blake2b(json.dumps(parts, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+class CachedDetections:
+    # Read-only view over one cache entry. Columns are separate .npy files opened memory-mapped:
+    #   frame_index (F,)  sorted source frame indices that were processed
+    #   offsets     (F+1,) row range of each frame in the per-detection columns
+    #   xyxy (N, 4) float32, class_id (N,) int16, tracker_id (N,) int32, confidence (N,) float32
+    #   predicted (N,) bool: box carried forward by frame skipping rather than detected (optional)
+    def __init__(self, directory):
+        self.directory = directory
+        self.frame_index = np.load(os.path.join(directory, "frame_index.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+        self.xyxy = np.load(os.path.join(directory, "xyxy.npy"), mmap_mode="r")
+        self.class_id = np.load(os.path.join(directory, "class_id.npy"), mmap_mode="r")
+        self.tracker_id = np.load(os.path.join(directory, "tracker_id.npy"), mmap_mode="r")
+        self.confidence = np.load(os.path.join(directory, "confidence.npy"), mmap_mode="r")
+        predicted = os.path.join(directory, "predicted.npy")
+        self.predicted = np.load(predicted, mmap_mode="r") if os.path.isfile(predicted) else None
+
+    def __len__(self):
+        return len(self.frame_index)
+
+    def get(self, frame_index):
+        import supervision as sv
+
+        position = int(np.searchsorted(self.frame_index, frame_index))
+        if position >= len(self.frame_index) or self.frame_index[position] != frame_index:
+            return None
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        if start == end:
+            return sv.Detections.empty()
+        return sv.Detections(
+            xyxy=np.array(self.xyxy[start:end]),
+            class_id=np.array(self.class_id[start:end], dtype=int),
+            tracker_id=np.array(self.tracker_id[start:end], dtype=int),
+            confidence=np.array(self.confidence[start:end]),
+            data={} if self.predicted is None else {"predicted": np.array(self.predicted[start:end])},
+        )
+
+    def __call__(self, frame_index, frame):
+        # Stands in for the tracker in an indexed StagedPipeline
+        detections = self.get(frame_index)
+        if detections is None:
+            import supervision as sv
+            return sv.Detections.empty()
+        return detections
+
+
+class DetectionCacheWriter:
+    # Collects per-frame detections in memory and writes them as one entry on commit()
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self._frames = []
+        self._counts = []
+        self._xyxy = []
+        self._class_id = []
+        self._tracker_id = []
+        self._confidence = []
+        self._predicted = []
+
+    def add(self, frame_index, detections):
+        count = len(detections)
+        self._frames.append(frame_index)
+        self._counts.append(count)
+        if count == 0:
+            return
+        self._xyxy.append(np.asarray(detections.xyxy, dtype=np.float32))
+        self._class_id.append(self._column(detections.class_id, count, np.int16, 0))
+        self._tracker_id.append(self._column(detections.tracker_id, count, np.int32, -1))
+        self._confidence.append(self._column(detections.confidence, count, np.float32, np.nan))
+        self._predicted.append(self._column(detections.data.get("predicted"), count, bool, False))
+
+    @staticmethod
+    def _column(values, count, dtype, fill):
+        if values is None:
+            return np.full(count, fill, dtype=dtype)
+        return np.asarray(values, dtype=dtype)
+
+    def columns(self):
+        # The collected detections in the cache's columnar layout (see CachedDetections)
+        frames = np.asarray(self._frames, dtype=np.int64)
+        if np.any(np.diff(frames) <= 0):
+            raise ValueError("Detections must be added once per frame, in frame order")
+
+        return {
+            "frame_index": frames,
+            "offsets": np.concatenate([[0], np.cumsum(self._counts)]).astype(np.int64),
+            "xyxy": np.concatenate(self._xyxy) if self._xyxy else np.empty((0, 4), dtype=np.float32),
+            "class_id": np.concatenate(self._class_id) if self._class_id else np.empty(0, dtype=np.int16),
+            "tracker_id": np.concatenate(self._tracker_id) if self._tracker_id else np.empty(0, dtype=np.int32),
+            "confidence": np.concatenate(self._confidence) if self._confidence else np.empty(0, dtype=np.float32),
+            "predicted": np.concatenate(self._predicted) if self._predicted else np.empty(0, dtype=bool),
+        }
+
+    def commit(self):
+        return self.cache.store(self.key, self.columns())
+
+
+class DetectionCache:
+    # Directory of entries keyed by cache_key(); least recently used entries are evicted
+    # once the total size goes over max_bytes.
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def _entry(self, key):
+        return os.path.join(self.root, key)
+
+    def load(self, key):
+        directory = self._entry(key)
+        if not os.path.isfile(os.path.join(directory, "meta.json")):
+            return None
+        os.utime(os.path.join(directory, "meta.json"))  # Mark as recently used
+        return CachedDetections(directory)
+
+    def writer(self, key):
+        return DetectionCacheWriter(self, key)
+
+    def store(self, key, columns):
+        # Write into a private directory first so readers never see a half-written entry
+        staging = os.path.join(self.root, f".{key}.{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        for name, values in columns.items():
+            np.save(os.path.join(staging, f"{name}.npy"), values)
+        with open(os.path.join(staging, "meta.json"), "w") as handle:
+            json.dump({"key": key, "frames": int(len(columns["frame_index"])), "created": time.time()}, handle)
+
+        directory = self._entry(key)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory, ignore_errors=True)
+        os.replace(staging, directory)
+        self.evict(keep=directory)
+        return directory
+
+    def entries(self):
+        # (last_used, size_in_bytes, directory) for every committed entry
+        found = []
+        for name in os.listdir(self.root):
+            directory = self._entry(name)
+            meta = os.path.join(directory, "meta.json")
+            if name.startswith(".") or not os.path.isfile(meta):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+            found.append((os.stat(meta).st_mtime, size, directory))
+        return found
+
+    def evict(self, keep=None):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, directory in entries:
+            if total <= self.max_bytes:
+                break
+            if directory == keep:
+                continue
+            shutil.rmtree(directory, ignore_errors=True)
+            total -= size
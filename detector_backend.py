@@ -0,0 +1,193 @@
+import argparse
+import importlib.util
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from detection import PERSON_CLASS_ID
+from frame_reader import SampledFrameReader
+
+BACKENDS = ("torch", "onnx", "openvino")
+DEFAULT_BACKEND = os.environ.get("DETECTOR_BACKEND", "torch")
+
+# Python module each exported backend needs at inference time
+_RUNTIME_MODULES = {"onnx": "onnxruntime", "openvino": "openvino"}
+
+
+def exported_path(weights, backend, int8=False):
+    # Where ultralytics (or the ONNX quantiser) leaves the exported model, so export happens once
+    stem = os.path.splitext(weights)[0]
+    if backend == "onnx":
+        return f"{stem}-int8.onnx" if int8 else f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_int8_openvino_model" if int8 else f"{stem}_openvino_model"
+    return weights
+
+
+def letterbox(frame, imgsz):
+    # Square model input: keep the aspect ratio, pad with grey like ultralytics does
+    height, width = frame.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    resized = cv2.resize(frame, (int(round(width * scale)), int(round(height * scale))))
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top = (imgsz - resized.shape[0]) // 2
+    left = (imgsz - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return canvas
+
+
+def calibration_frames(videos, count=200):
+    # Frames spread evenly over our own videos, used to calibrate int8 quantisation
+    per_video = max(1, count // max(1, len(videos)))
+    for video in videos:
+        with SampledFrameReader(video) as reader:
+            total = int(reader.cap.get(cv2.CAP_PROP_FRAME_COUNT)) or per_video
+            reader.stride = max(1, total // per_video)
+            for taken, (_, frame) in enumerate(reader):
+                if taken >= per_video:
+                    break
+                yield frame
+
+
+def _quantize_onnx(source, target, videos, imgsz, count):
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    input_name = onnxruntime.InferenceSession(source, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class VideoCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self.frames = calibration_frames(videos, count)
+
+        def get_next(self):
+            frame = next(self.frames, None)
+            if frame is None:
+                return None
+            rgb = cv2.cvtColor(letterbox(frame, imgsz), cv2.COLOR_BGR2RGB)
+            return {input_name: (rgb.transpose(2, 0, 1)[None].astype(np.float32) / 255.0)}
+
+    quantize_static(source, target, VideoCalibrationReader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    return target
+
+
+def _write_calibration_dataset(weights, videos, count):
+    # ultralytics calibrates OpenVINO int8 from a dataset YAML; build one from our video frames
+    directory = os.path.abspath(f"{os.path.splitext(weights)[0]}_calibration")
+    images = os.path.join(directory, "images")
+    os.makedirs(images, exist_ok=True)
+    for index, frame in enumerate(calibration_frames(videos, count)):
+        cv2.imwrite(os.path.join(images, f"{index:05d}.jpg"), frame)
+    data = os.path.join(directory, "data.yaml")
+    with open(data, "w") as handle:
+        handle.write(f"path: {directory}\ntrain: images\nval: images\nnames:\n  0: person\n")
+    return data
+
+
+def export_model(weights, backend, int8=False, calibration_videos=None, imgsz=640, calibration_count=200):
+    from ultralytics import YOLO
+
+    if int8 and not calibration_videos:
+        raise ValueError("int8 export needs calibration videos")
+    model = YOLO(weights)
+    if backend == "onnx":
+        path = model.export(format="onnx", imgsz=imgsz)
+        if int8:
+            path = _quantize_onnx(path, exported_path(weights, "onnx", int8=True), calibration_videos, imgsz,
+                                  calibration_count)
+        return path
+    if backend == "openvino":
+        options = {"int8": True, "data": _write_calibration_dataset(weights, calibration_videos, calibration_count)} if int8 else {}
+        return model.export(format="openvino", imgsz=imgsz, **options)
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def load_detector(weights="yolo11s.pt", backend=None, int8=False, calibration_videos=None, imgsz=640):
+    # YOLO model running on the requested backend (DETECTOR_BACKEND env var by default).
+    # The exported model is created on first use and reused afterwards; anything that goes
+    # wrong along the way falls back to the PyTorch weights.
+    from ultralytics import YOLO
+
+    backend = backend or DEFAULT_BACKEND
+    if backend != "torch":
+        try:
+            if backend not in _RUNTIME_MODULES:
+                raise ValueError(f"unknown backend {backend!r}, expected one of {BACKENDS}")
+            if importlib.util.find_spec(_RUNTIME_MODULES[backend]) is None:
+                raise ImportError(f"{_RUNTIME_MODULES[backend]} is not installed")
+            path = exported_path(weights, backend, int8)
+            if not os.path.exists(path):
+                path = export_model(weights, backend, int8, calibration_videos, imgsz)
+            model = YOLO(path, task="detect")
+            model.detector_backend = backend
+            return model
+        except Exception as exc:
+            print(f"{backend} backend unavailable ({exc}); falling back to PyTorch")
+    model = YOLO(weights)
+    model.detector_backend = "torch"  # Which backend actually runs, after any fallback
+    return model
+
+
+def compare_backends(video, weights="yolo11s.pt", backends=BACKENDS, int8=False, frames=300,
+                     size=(1020, 600), imgsz=640):
+    # Throughput and person-count agreement of each backend against PyTorch on the same frames
+    samples = []
+    with SampledFrameReader(video) as reader:
+        total = int(reader.cap.get(cv2.CAP_PROP_FRAME_COUNT)) or frames
+        reader.stride = max(1, total // frames)
+        for _, frame in reader:
+            samples.append(cv2.resize(frame, size))
+            if len(samples) >= frames:
+                break
+
+    report = []
+    reference = None
+    for backend in backends:
+        model = load_detector(weights, backend, int8=int8 and backend != "torch", calibration_videos=[video],
+                              imgsz=imgsz)
+        model.predict(samples[0], classes=PERSON_CLASS_ID, imgsz=imgsz, verbose=False)  # Warm-up
+        counts = []
+        start = time.perf_counter()
+        for frame in samples:
+            result = model.predict(frame, classes=PERSON_CLASS_ID, imgsz=imgsz, verbose=False)[0]
+            counts.append(len(result.boxes))
+        elapsed = time.perf_counter() - start
+        counts = np.array(counts)
+        if reference is None:
+            reference = counts  # The first backend (PyTorch by default) is the accuracy reference
+        report.append({
+            "backend": backend,
+            "ran_on": model.detector_backend,
+            "int8": bool(int8 and backend != "torch"),
+            "frames": len(samples),
+            "fps": round(len(samples) / elapsed, 2),
+            "count_mae": round(float(np.abs(counts - reference).mean()), 3),
+            "count_exact": round(float((counts == reference).mean()), 3),
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export YOLO for CPU backends and compare them side by side")
+    parser.add_argument("video", help="Video used for the comparison (and int8 calibration)")
+    parser.add_argument("--weights", default="yolo11s.pt")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--int8", action="store_true", help="Quantise exported models to int8")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--output", default="backend_report.json")
+    args = parser.parse_args()
+
+    report = compare_backends(args.video, args.weights, args.backends, args.int8, args.frames, imgsz=args.imgsz)
+    with open(args.output, "w") as handle:
+        json.dump(report, handle, indent=2)
+    for row in report:
+        print(f"{row['backend']:<9} int8={row['int8']!s:<5} {row['fps']:7.1f} fps  "
+              f"count MAE {row['count_mae']:.3f}  exact {row['count_exact']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
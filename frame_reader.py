@@ -0,0 +1,67 @@
+import math
+
+import cv2
+
+
+def parse_size(text):
+    # "WIDTHxHEIGHT" command-line sizes, e.g. "1020x600"
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+class SampledFrameReader:
+    # Yields (frame_index, frame) for the sampled frames of a video.
+    # Skipped frames are only grab()'ed, so they never pay for retrieve() and the BGR conversion.
+    # Sample either every `stride`-th frame or at `target_fps` effective frames per second.
+    # `start`/`end` limit reading to a frame range; indices stay those of the whole video.
+    def __init__(self, source, stride=1, target_fps=None, loop=False, start=0, end=None):
+        self.cap = source if isinstance(source, cv2.VideoCapture) else cv2.VideoCapture(source)
+        self.stride = stride  # May be changed while iterating
+        self.target_fps = target_fps
+        self.loop = loop  # Start again from `start` when the range ends
+        self.start = start
+        self.end = end  # Exclusive; None reads to the end of the video
+        self.source_fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.position = 0  # Index of the next frame to grab
+        if start:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            self.position = start
+
+    def keep(self, index):
+        if self.target_fps:
+            # Keep the frame whenever the effective-rate clock ticks over to a new output frame
+            ratio = self.target_fps / self.source_fps
+            return math.floor((index + 1) * ratio + 1e-9) > math.floor(index * ratio + 1e-9)
+        return (index + 1) % max(1, int(self.stride)) == 0
+
+    def __iter__(self):
+        grabbed_since_rewind = 0
+        while self.cap.isOpened():
+            if (self.end is not None and self.position >= self.end) or not self.cap.grab():
+                if self.loop and grabbed_since_rewind > 0:
+                    # Reset to the start of the video if the video ends
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start)
+                    self.position = self.start
+                    grabbed_since_rewind = 0
+                    continue
+                break
+
+            index = self.position
+            self.position += 1
+            grabbed_since_rewind += 1
+            if not self.keep(index):
+                continue
+
+            ret, frame = self.cap.retrieve()
+            if not ret:
+                continue
+            yield index, frame
+
+    def release(self):
+        self.cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,198 @@
+import math
+import time
+
+import numpy as np
+
+
+class AdaptiveStrideController:
+    # Feedback controller for how often the detector runs.
+    # Detecting costs `detect_latency`, carrying boxes forward costs `carry_latency`; with one
+    # detection every `stride` frames the mean cost per frame is
+    #     (detect_latency + (stride - 1) * carry_latency) / stride
+    # and the controller keeps that under the budget (1 / target_fps, or latency_budget) less the
+    # per-frame `overhead` spent outside the tracker (decode, drawing, display), when reported.
+    # When even max_stride cannot meet the budget it steps the model input size down through
+    # `imgsz_steps` (largest first), and back up once there is plenty of headroom again.
+    def __init__(self, target_fps=None, latency_budget=None, min_stride=1, max_stride=8,
+                 imgsz_steps=None, smoothing=0.2, cooldown=15):
+        if latency_budget is None:
+            if not target_fps:
+                raise ValueError("Either target_fps or latency_budget is required")
+            latency_budget = 1.0 / target_fps
+        self.latency_budget = latency_budget
+        self.min_stride = min_stride
+        self.max_stride = max_stride
+        self.imgsz_steps = list(imgsz_steps or [])
+        self.smoothing = smoothing
+        self.cooldown = cooldown  # Detections to measure before the input size may change again
+
+        self.stride = min_stride
+        self.imgsz_level = 0
+        self.detect_latency = None
+        self.carry_latency = None
+        self.overhead = None
+        self._detections_since_resize = 0
+
+    @property
+    def imgsz(self):
+        if not self.imgsz_steps:
+            return None
+        return self.imgsz_steps[self.imgsz_level]
+
+    def observe(self, latency, detected):
+        if detected:
+            self.detect_latency = self._smooth(self.detect_latency, latency)
+            self._detections_since_resize += 1
+        else:
+            self.carry_latency = self._smooth(self.carry_latency, latency)
+        self._retune()
+
+    def observe_overhead(self, seconds):
+        self.overhead = self._smooth(self.overhead, seconds)
+
+    @property
+    def tracker_budget(self):
+        # What is left of the per-frame budget for the tracker itself
+        return self.latency_budget - (self.overhead or 0.0)
+
+    def _smooth(self, average, sample):
+        if average is None:
+            return sample
+        return average + self.smoothing * (sample - average)
+
+    def required_stride(self):
+        carry = self.carry_latency or 0.0
+        budget = self.tracker_budget
+        if carry >= budget:
+            return math.inf
+        return max(1.0, (self.detect_latency - carry) / (budget - carry))
+
+    def _retune(self):
+        if self.detect_latency is None:
+            return
+        needed = self.required_stride()
+
+        if needed > self.stride:
+            self.stride = min(self.max_stride, math.ceil(needed))
+        elif math.ceil(needed * 1.2) < self.stride:  # 20% hysteresis before sampling more often
+            self.stride = max(self.min_stride, math.ceil(needed * 1.2))
+
+        if self._detections_since_resize < self.cooldown:
+            return
+        if needed > self.max_stride and self.imgsz_level < len(self.imgsz_steps) - 1:
+            self._resize(self.imgsz_level + 1)
+        elif self.stride == self.min_stride and self.detect_latency * 2 <= self.tracker_budget and self.imgsz_level > 0:
+            self._resize(self.imgsz_level - 1)
+
+    def _resize(self, level):
+        self.imgsz_level = level
+        self.detect_latency = None  # Re-measure at the new input size
+        self._detections_since_resize = 0
+
+
+def shift_masks(masks, offsets):
+    # Moves every (H, W) mask by its own whole-pixel (dx, dy); pixels shifted in from outside are empty
+    shifted = np.zeros_like(masks)
+    height, width = masks.shape[1:]
+    for index, (dx, dy) in enumerate(offsets):
+        y0, y1 = max(0, -dy), min(height, height - dy)
+        x0, x1 = max(0, -dx), min(width, width - dx)
+        if y1 > y0 and x1 > x0:
+            shifted[index, y0 + dy:y1 + dy, x0 + dx:x1 + dx] = masks[index, y0:y1, x0:x1]
+    return shifted
+
+
+class BoxPredictor:
+    # Constant-velocity extrapolation of the last tracked boxes, the same motion model the
+    # Kalman filter in ByteTrack/BoT-SORT uses, for frames where the detector did not run.
+    def __init__(self):
+        self._detections = None
+        self._velocity = None
+        self._step = 0
+
+    def update(self, step, detections):
+        velocity = np.zeros((len(detections), 4), dtype=np.float32)
+        previous = self._detections
+        if previous is not None and len(previous) and len(detections) and detections.tracker_id is not None:
+            _, now_idx, prev_idx = np.intersect1d(detections.tracker_id, previous.tracker_id, return_indices=True)
+            elapsed = max(1, step - self._step)
+            velocity[now_idx] = (detections.xyxy[now_idx] - previous.xyxy[prev_idx]) / elapsed
+        self._detections = detections
+        self._velocity = velocity
+        self._step = step
+
+    def predict(self, step):
+        import supervision as sv
+
+        if self._detections is None or len(self._detections) == 0:
+            return sv.Detections.empty()
+        predicted = self._detections[:]
+        motion = self._velocity * (step - self._step)
+        predicted.xyxy = self._detections.xyxy + motion
+        if predicted.mask is not None:
+            # Segmentation masks move with their box centre, so the overlay does not crop a stale mask
+            centre = np.round((motion[:, :2] + motion[:, 2:]) / 2).astype(int)
+            predicted.mask = shift_masks(self._detections.mask, centre)
+        predicted.data["predicted"] = np.ones(len(predicted), dtype=bool)  # Not measured: counters skip these rows
+        return predicted
+
+    def reset(self):
+        self._detections = None
+        self._velocity = None
+
+
+class AdaptiveTracker:
+    # Drop-in replacement for PersonTracker: runs the detector on one of every
+    # `controller.stride` frames and carries tracks forward in between.
+    # whole_loop=True is for single-threaded loops (the standalone scripts): the time between two
+    # calls (decode, resizing, annotation, imshow/waitKey) is reported to the controller as
+    # overhead, so the target rate holds for the whole loop. Leave it off in a staged pipeline,
+    # where that gap is only waiting for the other stages.
+    def __init__(self, tracker, controller, whole_loop=False):
+        self.tracker = tracker
+        self.controller = controller
+        self.whole_loop = whole_loop
+        self.predictor = BoxPredictor()
+        self._step = 0
+        self._last_detect_step = None
+        self._last_return = None
+
+    def __call__(self, frame):
+        start = time.perf_counter()
+        if self.whole_loop and self._last_return is not None:
+            self.controller.observe_overhead(start - self._last_return)
+        step = self._step
+        self._step += 1
+
+        detect = self._last_detect_step is None or step - self._last_detect_step >= self.controller.stride
+        if detect:
+            self.tracker.imgsz = self.controller.imgsz
+            detections = self.tracker(frame)
+            self.predictor.update(step, detections)
+            self._last_detect_step = step
+        else:
+            detections = self.predictor.predict(step)
+
+        self.controller.observe(time.perf_counter() - start, detect)
+        self._last_return = time.perf_counter()
+        return detections
+
+    def reset(self):
+        self.tracker.reset()
+        self.predictor.reset()
+        self._step = 0
+        self._last_detect_step = None
+        self._last_return = None
+
+
+def build_script_tracker(model, reader, display_size=(1020, 600)):
+    # (tracker, preprocess) for the standalone single-threaded scripts: YOLO runs as often as this
+    # machine keeps up with the video frame rate, counting the whole loop (decode, drawing, imshow)
+    # against the budget, and gets the source frame letterboxed to its input size
+    from detection import PersonTracker
+    from motion_gate import MotionGatedTracker
+    from preprocess import LetterboxPreprocessor
+
+    tracker = AdaptiveTracker(MotionGatedTracker(PersonTracker(model)),
+                              AdaptiveStrideController(target_fps=reader.source_fps), whole_loop=True)
+    return tracker, LetterboxPreprocessor(display_size=display_size, pool_size=2)
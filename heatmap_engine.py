@@ -0,0 +1,120 @@
+import argparse
+
+import cv2
+import numpy as np
+
+
+class OccupancyHeatmap:
+    # Person occupancy accumulated into a coarse float32 grid (one cell per `cell` x `cell` pixels).
+    # Each frame adds every box footprint at once through a 2-D difference array and two cumsums,
+    # so the cost depends on the grid size, not on the number or size of the boxes. With `decay`
+    # (e.g. 0.99 per frame) older activity fades out and the map shows recent occupancy instead.
+    def __init__(self, frame_size, cell=8, decay=None):
+        self.frame_size = tuple(frame_size)  # (width, height) of the frames boxes refer to
+        self.cell = cell
+        self.decay = decay
+        width, height = self.frame_size
+        self.grid = np.zeros((-(-height // cell), -(-width // cell)), dtype=np.float32)
+        self.frames = 0
+
+    def add(self, xyxy, weight=1.0):
+        if self.decay is not None:
+            self.grid *= self.decay
+        self.frames += 1
+        boxes = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        if len(boxes) == 0:
+            return
+        rows, cols = self.grid.shape
+        x1 = np.clip(np.floor(boxes[:, 0] / self.cell), 0, cols).astype(int)
+        y1 = np.clip(np.floor(boxes[:, 1] / self.cell), 0, rows).astype(int)
+        x2 = np.clip(np.ceil(boxes[:, 2] / self.cell), 0, cols).astype(int)
+        y2 = np.clip(np.ceil(boxes[:, 3] / self.cell), 0, rows).astype(int)
+        diff = np.zeros((rows + 1, cols + 1), dtype=np.float32)
+        np.add.at(diff, (y1, x1), weight)
+        np.add.at(diff, (y1, x2), -weight)
+        np.add.at(diff, (y2, x1), -weight)
+        np.add.at(diff, (y2, x2), weight)
+        self.grid += diff.cumsum(axis=0).cumsum(axis=1)[:rows, :cols]
+
+    def normalized(self):
+        peak = float(self.grid.max())
+        return self.grid / peak if peak > 0 else self.grid
+
+    def render(self, size=None, colormap=cv2.COLORMAP_JET):
+        # Colour image of the map, upsampled to `size` (default: the frame size) only at this point
+        heat = cv2.resize(self.normalized(), tuple(size or self.frame_size), interpolation=cv2.INTER_LINEAR)
+        return cv2.applyColorMap((heat * 255).astype(np.uint8), colormap)
+
+    def overlay(self, scene, alpha=0.5, colormap=cv2.COLORMAP_JET):
+        # Blends the map onto the occupied parts of `scene`, in place
+        heat = cv2.resize(self.normalized(), (scene.shape[1], scene.shape[0]), interpolation=cv2.INTER_LINEAR)
+        occupied = heat > 0.01
+        if not occupied.any():
+            return scene
+        colored = cv2.applyColorMap((heat * 255).astype(np.uint8), colormap)
+        blended = cv2.addWeighted(scene, 1.0 - alpha, colored, alpha, 0)
+        cv2.copyTo(blended, occupied.view(np.uint8), scene)
+        return scene
+
+    def merge(self, other):
+        # Adds another map (another video or camera); a different grid is resampled onto this one
+        grid = other.grid
+        if grid.shape != self.grid.shape:
+            # Cells hold frames-occupied counts, so resampling keeps the values rather than the sum
+            grid = cv2.resize(grid, (self.grid.shape[1], self.grid.shape[0]), interpolation=cv2.INTER_AREA)
+        self.grid += grid
+        self.frames += other.frames
+        return self
+
+    def save(self, path):
+        np.savez_compressed(path, grid=self.grid, frames=self.frames, cell=self.cell, frame_size=self.frame_size,
+                            decay=np.nan if self.decay is None else self.decay)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        decay = float(data["decay"])
+        heatmap = cls(tuple(int(value) for value in data["frame_size"]), int(data["cell"]),
+                      None if np.isnan(decay) else decay)
+        heatmap.grid = data["grid"].astype(np.float32)
+        heatmap.frames = int(data["frames"])
+        return heatmap
+
+    def export(self, stem, size=None):
+        # <stem>.png for people, <stem>.npy (raw float32 grid) for dashboards, <stem>.npz to resume or merge
+        cv2.imwrite(f"{stem}.png", self.render(size))
+        np.save(f"{stem}.npy", self.grid)
+        self.save(f"{stem}.npz")
+        return [f"{stem}.png", f"{stem}.npy", f"{stem}.npz"]
+
+
+class HeatmapAnnotator:
+    # HeatMap mode: annotator interface around an OccupancyHeatmap sized from the first frame
+    def __init__(self, cell=8, decay=None, alpha=0.5):
+        self.cell = cell
+        self.decay = decay
+        self.alpha = alpha
+        self.heatmap = None
+
+    def annotate(self, scene, detections):
+        if self.heatmap is None or self.heatmap.frame_size != (scene.shape[1], scene.shape[0]):
+            self.heatmap = OccupancyHeatmap((scene.shape[1], scene.shape[0]), self.cell, self.decay)
+        self.heatmap.add(detections.xyxy)
+        return self.heatmap.overlay(scene, self.alpha)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge saved occupancy heatmaps and export them")
+    parser.add_argument("inputs", nargs="+", help=".npz heatmaps saved by the app or heat.py")
+    parser.add_argument("--output", default="heatmap", help="Output path without extension")
+    args = parser.parse_args()
+
+    merged = OccupancyHeatmap.load(args.inputs[0])
+    for path in args.inputs[1:]:
+        merged.merge(OccupancyHeatmap.load(path))
+    for path in merged.export(args.output):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
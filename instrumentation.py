@@ -0,0 +1,134 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds: 0.1 ms to ~10 s, each about 10% wider than the last
+_BUCKETS = [1e-4 * 1.1 ** i for i in range(122)]
+
+
+class LatencyHistogram:
+    # Fixed log-spaced buckets: recording is one bisect and an increment, percentiles are
+    # accurate to about 10%, and memory does not grow with the number of samples.
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        if self.count == 0:
+            return 0.0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(_BUCKETS[bucket], self.max) if bucket < len(_BUCKETS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(1000.0 * self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(1000.0 * self.percentile(50), 3),
+            "p99_ms": round(1000.0 * self.percentile(99), 3),
+            "max_ms": round(1000.0 * self.max, 3),
+        }
+
+
+class StageStats:
+    # Per-stage latency histograms plus throughput counters, shared by all pipeline threads
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.counters = {}
+            self.started = time.perf_counter()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def record_timings(self, timings):
+        for stage, seconds in timings.items():
+            self.record(stage, seconds)
+
+    def increment(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def set(self, counter, value):
+        with self._lock:
+            self.counters[counter] = value
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def rate(self, counter):
+        elapsed = time.perf_counter() - self.started
+        return self.counters.get(counter, 0) / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            return {
+                "time": time.time(),
+                "elapsed_s": round(elapsed, 3),
+                "fps": round(self.counters.get("frames", 0) / elapsed, 2) if elapsed > 0 else 0.0,
+                "counters": dict(self.counters),
+                "stages": {stage: histogram.summary() for stage, histogram in self.stages.items()},
+            }
+
+
+class JsonLinesExporter:
+    # Appends a StageStats snapshot to a JSON-lines file at most every `interval` seconds
+    def __init__(self, stats, path, interval=5.0):
+        self.stats = stats
+        self.path = path
+        self.interval = interval
+        self._last = 0.0
+
+    def maybe_write(self, **extra):
+        now = time.perf_counter()
+        if now - self._last < self.interval:
+            return False
+        self.write(**extra)
+        return True
+
+    def write(self, **extra):
+        self._last = time.perf_counter()
+        record = self.stats.snapshot()
+        record.update(extra)
+        self._append(record)
+
+    def write_event(self, event, **fields):
+        # One-off records (such as startup timings) that are not pipeline snapshots
+        record = {"time": time.time(), "event": event}
+        record.update(fields)
+        self._append(record)
+
+    def _append(self, record):
+        with open(self.path, "a") as handle:
+            handle.write(json.dumps(record) + "\n")
@@ -0,0 +1,35 @@
+import threading
+
+
+class LatestFrameMailbox:
+    # Single overwriteable slot between a producer thread and the Tk loop.
+    # The producer never waits: an unread frame is replaced and counted as dropped,
+    # so a slow GUI sees fresh frames instead of a growing backlog.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._item = None
+        self._fresh = False
+        self.delivered = 0
+        self.dropped = 0
+
+    def put(self, frame, info=0):
+        # `info` travels with the frame: the person count, or whatever the consumer shows beside it
+        with self._lock:
+            if self._fresh:
+                self.dropped += 1
+            self._item = (frame, info)
+            self._fresh = True
+
+    def take(self):
+        # Returns (frame, info) once per new frame, otherwise None
+        with self._lock:
+            if not self._fresh:
+                return None
+            self._fresh = False
+            self.delivered += 1
+            return self._item
+
+    def clear(self):
+        with self._lock:
+            self._item = None
+            self._fresh = False
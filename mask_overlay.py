@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+
+
+def _clipped_boxes(xyxy, width, height):
+    boxes = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4).round().astype(np.int32)
+    boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+    boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
+    visible = np.flatnonzero((boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1]))
+    return boxes[visible], visible
+
+
+def combined_mask(shape, xyxy, masks=None):
+    # One boolean mask covering every box (or every segmentation mask, cropped to its box),
+    # limited to the union of the boxes. Returns (mask, (x1, y1)) or (None, None) when empty.
+    height, width = shape[:2]
+    boxes, visible = _clipped_boxes(xyxy, width, height)
+    if len(boxes) == 0:
+        return None, None
+
+    x0, y0 = boxes[:, :2].min(axis=0)
+    x1, y1 = boxes[:, 2:].max(axis=0)
+    mask = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+    for index, (bx1, by1, bx2, by2) in zip(visible, boxes):
+        region = mask[by1 - y0:by2 - y0, bx1 - x0:bx2 - x0]
+        if masks is None:
+            region[:] = True
+        else:
+            region |= masks[index, by1:by2, bx1:bx2]
+    return mask, (x0, y0)
+
+
+def overlay_mask(frame, mask, origin=(0, 0), color=(0, 255, 0), alpha=0.5):
+    # Blends `color` into the masked pixels once, in place. Only the mask's bounding region is
+    # touched, and the blend is two vectorised passes plus one masked copy.
+    x0, y0 = origin
+    region = frame[y0:y0 + mask.shape[0], x0:x0 + mask.shape[1]]
+    tinted = cv2.convertScaleAbs(region, alpha=1.0 - alpha)
+    tinted = cv2.add(tinted, tuple(float(channel) * alpha for channel in color) + (0.0,))
+    cv2.copyTo(tinted, mask.view(np.uint8), region)
+    return frame
+
+
+def overlay_detections(frame, detections, color=(0, 255, 0), alpha=0.5):
+    # Semi-transparent fill of every detection: real masks when a -seg model produced them, boxes otherwise.
+    # Cost grows with the area the boxes cover rather than with box count times frame size.
+    if len(detections) == 0:
+        return frame
+    mask, origin = combined_mask(frame.shape, detections.xyxy, detections.mask)
+    if mask is None:
+        return frame
+    return overlay_mask(frame, mask, origin, color, alpha)
@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    # Cheap "has anything moved?" test run before the detector. Frames are shrunk to a small
+    # blurred grayscale thumbnail and compared with the thumbnail of the last frame that was
+    # actually detected, so slow movement still adds up until it crosses the threshold.
+    def __init__(self, threshold=0.002, pixel_delta=25, width=160, max_interval=30):
+        self.threshold = threshold        # Fraction of thumbnail pixels that must change
+        self.pixel_delta = pixel_delta    # Grey-level difference that counts as a changed pixel
+        self.width = width
+        self.max_interval = max_interval  # Detect at least once every this many frames regardless
+        self.reference = None
+        self.since_detect = 0
+        self.motion = 0.0  # Changed-pixel fraction of the last frame checked
+
+    def thumbnail(self, frame):
+        height = max(1, round(frame.shape[0] * self.width / frame.shape[1]))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)  # Sensor noise should not count as motion
+
+    def should_detect(self, frame):
+        # True when the detector has to run on this frame; the frame then becomes the new reference
+        thumbnail = self.thumbnail(frame)
+        if self.reference is None or self.reference.shape != thumbnail.shape:
+            self.motion = 1.0
+        else:
+            changed = cv2.absdiff(thumbnail, self.reference) > self.pixel_delta
+            self.motion = np.count_nonzero(changed) / changed.size
+        self.since_detect += 1
+        if self.motion < self.threshold and self.since_detect < self.max_interval:
+            return False
+        self.reference = thumbnail
+        self.since_detect = 0
+        return True
+
+    def reset(self):
+        self.reference = None
+        self.since_detect = 0
+        self.motion = 0.0
+
+
+class MotionGatedTracker:
+    # Wraps a tracker (PersonTracker or anything else called per frame) and only calls it when the
+    # gate sees motion; static frames get the last detections back unchanged, so the person count
+    # is reused as well. Fits inside AdaptiveTracker, which then sees gated frames as cheap detections.
+    def __init__(self, tracker, gate=None, stats=None):
+        self.tracker = tracker
+        self.gate = gate or MotionGate()
+        self.stats = stats
+        self.detector_calls = 0
+        self.skipped = 0
+        self._detections = None
+
+    @property
+    def imgsz(self):
+        return self.tracker.imgsz
+
+    @imgsz.setter
+    def imgsz(self, value):
+        self.tracker.imgsz = value
+
+    def __call__(self, frame):
+        if self._detections is not None and not self.gate.should_detect(frame):
+            self.skipped += 1
+            if self.stats is not None:
+                self.stats.increment("motion_skipped")
+            return self._detections[:]
+        if self._detections is None:
+            self.gate.should_detect(frame)  # First frame: always detect, and keep it as the reference
+        self._detections = self.tracker(frame)
+        self.detector_calls += 1
+        if self.stats is not None:
+            self.stats.increment("detector_calls")
+        return self._detections
+
+    def reset(self):
+        self.tracker.reset()
+        self.gate.reset()
+        self._detections = None
+        self.detector_calls = 0
+        self.skipped = 0
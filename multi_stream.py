@@ -0,0 +1,270 @@
+import argparse
+import queue
+import threading
+import time
+import tkinter as tk
+from tkinter import Canvas, Frame, Label
+
+import cv2
+from PIL import Image, ImageTk
+
+from annotators import ANNOTATOR_MODES, make_annotator
+from batch_infer import BatchedPersonTracker
+from count_log import CountLog
+from detection import count_persons
+from detector_backend import BACKENDS, DEFAULT_BACKEND, load_detector
+from frame_reader import SampledFrameReader, parse_size
+from instrumentation import StageStats
+from mailbox import LatestFrameMailbox
+from pipeline import PipelineWorker
+
+
+class StreamInput:
+    # One source (file or camera) decoded on its own thread into a short queue of resized frames.
+    # Each stream keeps its own ByteTrack and annotator so IDs never leak between entrances.
+    def __init__(self, source, size, stride=1, loop=False, queue_depth=2, mode="BoxCorner", frame_ready=None):
+        import supervision as sv
+
+        self.source = source
+        self.name = source if isinstance(source, str) else f"camera {source}"
+        self.size = size
+        self.reader = SampledFrameReader(source, stride=stride, loop=loop)
+        self.byte_track = sv.ByteTrack(frame_rate=int(round(self.reader.source_fps / stride)))
+        self.annotator = make_annotator(mode)
+        self.mailbox = LatestFrameMailbox()  # Annotated RGB frames for this stream's grid cell
+        self.frames = queue.Queue(maxsize=queue_depth)
+        self.frame_ready = frame_ready  # Shared event that wakes the scheduler
+        self.finished = False
+        self.processed = 0
+        self._thread = None
+
+    def start(self, stop_event, resume_event):
+        self._thread = threading.Thread(target=self._decode, args=(stop_event, resume_event),
+                                        name=f"decode-{self.name}", daemon=True)
+        self._thread.start()
+
+    def _decode(self, stop_event, resume_event):
+        try:
+            for index, frame in self.reader:
+                frame = cv2.resize(frame, self.size)
+                while not stop_event.is_set():
+                    if not resume_event.wait(0.1):
+                        continue
+                    try:
+                        self.frames.put((index, frame), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop_event.is_set():
+                    break
+                if self.frame_ready is not None:
+                    self.frame_ready.set()
+        finally:
+            self.finished = True
+            if self.frame_ready is not None:
+                self.frame_ready.set()
+
+    def poll(self):
+        try:
+            return self.frames.get_nowait()
+        except queue.Empty:
+            return None
+
+    @property
+    def exhausted(self):
+        return self.finished and self.frames.empty()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def release(self):
+        self.reader.release()
+
+
+class MultiStreamPipeline:
+    # N sources, one detector. Each tick takes at most one frame from every stream that has one
+    # ready (round-robin start, capped at max_batch) and runs them through a single predict call,
+    # so a fast stream cannot crowd out the others and the model is loaded only once.
+    # Has the same stop/pause/resume surface as StagedPipeline, so PipelineWorker can drive it.
+    # The shared model is only used through predict (detect_batch); tracking is per stream.
+    def __init__(self, model, sources, size=(640, 360), max_batch=None, imgsz=None, stride=1, loop=False,
+                 mode="BoxCorner", stats=None, count_log=None):
+        self.frame_ready = threading.Event()
+        self.streams = [StreamInput(source, size, stride=stride, loop=loop, mode=mode, frame_ready=self.frame_ready)
+                        for source in sources]
+        self.detector = BatchedPersonTracker(model, imgsz=imgsz)
+        self.max_batch = max_batch or len(self.streams)
+        self.stats = stats
+        self.count_log = count_log  # Optional CountLog, one source per stream name
+        self._cursor = 0  # Stream that goes first in the next tick
+        self._stop = threading.Event()
+        self._resume = threading.Event()
+        self._resume.set()
+        self.error = None
+
+    def stop(self):
+        self._stop.set()
+        self.frame_ready.set()
+
+    def pause(self):
+        self._resume.clear()
+
+    def resume(self):
+        self._resume.set()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    @property
+    def paused(self):
+        return not self._resume.is_set()
+
+    def run(self):
+        # Blocks until every stream is exhausted, stop() is called or inference fails
+        for stream in self.streams:
+            stream.start(self._stop, self._resume)
+        try:
+            while not self._stop.is_set():
+                self.frame_ready.clear()
+                batch = self._next_batch()
+                if batch:
+                    self._process(batch)
+                elif all(stream.exhausted for stream in self.streams):
+                    break
+                else:
+                    self.frame_ready.wait(0.1)
+        except Exception as exc:
+            self.error = exc  # Inference failures end every stream, like a failed StagedPipeline stage
+            raise
+        finally:
+            self._stop.set()
+            for stream in self.streams:
+                stream.join(1.0)
+                stream.release()
+
+    def _next_batch(self):
+        batch = []
+        count = len(self.streams)
+        for offset in range(count):
+            position = (self._cursor + offset) % count
+            item = self.streams[position].poll()
+            if item is None:
+                continue
+            batch.append((self.streams[position], item))
+            if len(batch) >= self.max_batch:
+                self._cursor = (position + 1) % count  # Streams left out this tick go first next tick
+                break
+        return batch
+
+    def _process(self, batch):
+        start = time.perf_counter()
+        detections = self.detector.detect_batch([frame for _, (_, frame) in batch])
+        inferred = time.perf_counter()
+        for (stream, (index, frame)), frame_detections in zip(batch, detections):
+            tracked = stream.byte_track.update_with_detections(frame_detections)
+            person_count = count_persons(tracked)
+            if self.count_log is not None:
+                self.count_log.log_frame(stream.name, index, tracked, person_count,
+                                         video_time=index / stream.reader.source_fps)
+            frame = stream.annotator.annotate(frame, tracked)  # Empty frames too, so heatmaps and traces keep ageing
+            stream.mailbox.put(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), person_count)
+            stream.processed += 1
+        if self.stats is not None:
+            self.stats.record("infer", inferred - start)
+            self.stats.record("track+annotate", time.perf_counter() - inferred)
+            self.stats.increment("batches")
+            self.stats.increment("frames", len(batch))
+
+
+class MultiStreamWindow:
+    # Grid of canvases, one per stream, fed from each stream's mailbox by the Tk loop
+    def __init__(self, master, model, sources, columns=2, size=(640, 360), mode="BoxCorner", max_batch=None,
+                 loop=False, refresh_ms=16, on_close=None, count_log=None):
+        self.master = master
+        self.on_close = on_close
+        self.size = size
+        self.refresh_ms = refresh_ms
+        self.stats = StageStats()
+        self.pipeline = MultiStreamPipeline(model, sources, size=size, max_batch=max_batch, loop=loop, mode=mode,
+                                            stats=self.stats, count_log=count_log)
+        self.worker = PipelineWorker(lambda worker: worker.run_pipeline(self.pipeline), name="multi-stream")
+
+        self.window = tk.Toplevel(master)
+        self.window.title(f"Multi-Stream ({len(sources)} sources)")
+        self.window.configure(bg="#34495E")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.cells = []
+        for position, stream in enumerate(self.pipeline.streams):
+            cell = Frame(self.window, bg="#34495E")
+            cell.grid(row=position // columns, column=position % columns, padx=4, pady=4)
+            canvas = Canvas(cell, width=size[0], height=size[1], bg="black", highlightthickness=0)
+            canvas.pack()
+            label = Label(cell, text=f"{stream.name}: 0", bg="#1F618D", fg="white", font=("Arial", 12, "bold"))
+            label.pack(fill=tk.X)
+            self.cells.append({"canvas": canvas, "image": canvas.create_image(0, 0, anchor=tk.NW),
+                               "photo": None, "label": label})
+        self.status_label = Label(self.window, text="", bg="#2C3E50", fg="white", font=("Courier", 10), anchor=tk.W)
+        self.status_label.grid(row=(len(self.cells) + columns - 1) // columns, column=0, columnspan=columns,
+                               sticky="we")
+
+        self.worker.start()
+        self.window.after(self.refresh_ms, self.poll)
+
+    def poll(self):
+        if not self.window.winfo_exists():
+            return
+        for stream, cell in zip(self.pipeline.streams, self.cells):
+            item = stream.mailbox.take()
+            if item is None:
+                continue
+            frame, person_count = item
+            img = Image.fromarray(frame)
+            if cell["photo"] is None:
+                cell["photo"] = ImageTk.PhotoImage(image=img)
+                cell["canvas"].itemconfig(cell["image"], image=cell["photo"])
+            else:
+                cell["photo"].paste(img)
+            cell["label"].config(text=f"{stream.name}: {person_count}")
+        snapshot = self.stats.snapshot()
+        batches = snapshot["counters"].get("batches", 0)
+        mean_batch = snapshot["counters"].get("frames", 0) / batches if batches else 0.0
+        self.status_label.config(text=f"FPS: {snapshot['fps']:.1f}  Mean batch: {mean_batch:.1f}")
+        self.window.after(self.refresh_ms, self.poll)
+
+    def close(self):
+        self.worker.stop(timeout=5.0)
+        self.window.destroy()
+        if self.on_close is not None:
+            self.on_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show several videos or cameras in a grid with one shared detector")
+    parser.add_argument("sources", nargs="+", help="Video files, or camera indices such as 0")
+    parser.add_argument("--model", default="yolo11s.pt")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS)
+    parser.add_argument("--columns", type=int, default=2)
+    parser.add_argument("--size", type=parse_size, default=(640, 360), help="Per-stream WIDTHxHEIGHT")
+    parser.add_argument("--mode", default="BoxCorner", choices=list(ANNOTATOR_MODES))
+    parser.add_argument("--max-batch", type=int, help="Frames per inference call (default: one per stream)")
+    parser.add_argument("--loop", action="store_true", help="Restart video files when they end")
+    parser.add_argument("--log", help="SQLite file to append per-frame counts and track boxes to")
+    args = parser.parse_args()
+
+    sources = [int(source) if source.isdigit() else source for source in args.sources]
+    model = load_detector(args.model, backend=args.backend)
+    count_log = CountLog(args.log) if args.log else None
+    root = tk.Tk()
+    root.withdraw()  # Only the grid window is shown
+    MultiStreamWindow(root, model, sources, columns=args.columns, size=args.size, mode=args.mode,
+                      max_batch=args.max_batch, loop=args.loop, on_close=root.destroy, count_log=count_log)
+    root.mainloop()
+    if count_log is not None:
+        count_log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import queue
+import threading
+import time
+
+_END = object()  # End-of-stream marker passed down the stage queues
+
+
+class FramePacket:
+    # One frame travelling through the pipeline, plus what each stage attached to it
+    __slots__ = ("index", "frame", "model_input", "detections", "timings")
+
+    def __init__(self, index, frame, model_input=None):
+        self.index = index
+        self.frame = frame
+        self.model_input = model_input  # Separate detector input (e.g. a LetterboxedFrame), if any
+        self.detections = None
+        self.timings = {}
+
+
+class StagedPipeline:
+    # Decode -> infer/track -> annotate, each on its own thread, joined by bounded queues.
+    # A full queue blocks the stage feeding it (backpressure), so throughput approaches
+    # the speed of the slowest stage instead of the sum of all stages.
+    def __init__(self, source, infer, annotate, sink, prepare=None, queue_depth=4, batch_size=1, indexed=False,
+                 stats=None, prepare_input=None):
+        self.source = source        # iterable of (frame_index, frame)
+        self.prepare = prepare      # optional per-frame transform run in the decode stage (e.g. resize)
+        self.prepare_input = prepare_input  # optional source frame -> detector input with .image and
+                                            # .restore(detections), so infer never sees the display frame
+        self.infer = infer          # frame -> sv.Detections, always called in frame order;
+                                    # with batch_size > 1, list of frames -> list of sv.Detections
+        self.batch_size = batch_size
+        self.indexed = indexed      # infer also receives the frame index(es) first, e.g. for cached replay
+        self.stats = stats          # optional StageStats fed with every packet's stage timings
+        self.annotate = annotate    # (frame, detections) -> annotated frame
+        self.sink = sink            # receives each finished FramePacket
+        self.queue_depth = queue_depth
+
+        self._decoded = queue.Queue(maxsize=queue_depth)
+        self._inferred = queue.Queue(maxsize=queue_depth)
+        self._stop = threading.Event()
+        self._resume = threading.Event()
+        self._resume.set()
+        self.error = None
+
+    def stop(self):
+        self._stop.set()
+
+    def pause(self):
+        # Decoding halts; frames already queued drain through the later stages
+        self._resume.clear()
+
+    def resume(self):
+        self._resume.set()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    @property
+    def paused(self):
+        return not self._resume.is_set()
+
+    def run(self):
+        # Blocks until the source is exhausted, stop() is called or a stage fails
+        threads = [
+            threading.Thread(target=self._guard, args=(self._decode_stage,), name="decode", daemon=True),
+            threading.Thread(target=self._guard, args=(self._infer_stage,), name="infer", daemon=True),
+            threading.Thread(target=self._guard, args=(self._render_stage,), name="render", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self.error is not None:
+            raise self.error
+
+    def _guard(self, stage):
+        try:
+            stage()
+        except Exception as exc:  # Surface the first failure from run() and shut the other stages down
+            if self.error is None:
+                self.error = exc
+            self._stop.set()
+
+    def _put(self, q, item):
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _decode_stage(self):
+        frames = iter(self.source)
+        try:
+            while not self._stop.is_set():
+                if not self._resume.wait(0.1):
+                    continue
+                start = time.perf_counter()
+                item = next(frames, None)
+                if item is None:
+                    break
+                index, frame = item
+                decoded = time.perf_counter()
+                model_input = None if self.prepare_input is None else self.prepare_input(frame)
+                if self.prepare is not None:
+                    frame = self.prepare(frame)
+                packet = FramePacket(index, frame, model_input)
+                packet.timings["decode"] = decoded - start
+                packet.timings["prepare"] = time.perf_counter() - decoded
+                if not self._put(self._decoded, packet):
+                    break
+        finally:
+            self._put(self._decoded, _END)
+
+    def _infer_stage(self):
+        try:
+            while True:
+                batch = self._next_batch()
+                if not batch:
+                    break
+                start = time.perf_counter()
+                detections = self._run_infer(batch)
+                elapsed = (time.perf_counter() - start) / len(batch)
+                for packet, packet_detections in zip(batch, detections):
+                    if packet.model_input is not None:
+                        packet_detections = packet.model_input.restore(packet_detections)
+                        packet.model_input = None  # Its buffer goes back to the preprocessor's pool
+                    packet.detections = packet_detections
+                    packet.timings["infer"] = elapsed
+                    if not self._put(self._inferred, packet):
+                        return
+                if len(batch) < self.batch_size:
+                    break  # The decode stage already signalled the end of the stream
+        finally:
+            self._put(self._inferred, _END)
+
+    def _run_infer(self, batch):
+        frames = [packet.frame if packet.model_input is None else packet.model_input.image for packet in batch]
+        if self.batch_size > 1:
+            if self.indexed:
+                return self.infer([packet.index for packet in batch], frames)
+            return self.infer(frames)
+        return [self.infer(batch[0].index, frames[0]) if self.indexed else self.infer(frames[0])]
+
+    def _next_batch(self):
+        # Waits until batch_size frames are decoded (or the stream ends) so they share one inference call
+        batch = []
+        while len(batch) < self.batch_size:
+            packet = self._get(self._decoded)
+            if packet is _END:
+                break
+            batch.append(packet)
+        return batch
+
+    def _render_stage(self):
+        while True:
+            packet = self._get(self._inferred)
+            if packet is _END:
+                break
+            start = time.perf_counter()
+            packet.frame = self.annotate(packet.frame, packet.detections)
+            packet.timings["annotate"] = time.perf_counter() - start
+            self.sink(packet)
+            if self.stats is not None:
+                self.stats.record_timings(packet.timings)
+                self.stats.increment("frames")
+
+
+class PipelineWorker:
+    # Owns the one worker thread allowed to run a pipeline, with explicit start/pause/resume/stop.
+    # `target(worker)` runs on that thread and hands its pipeline to run_pipeline(), so stop()
+    # can cancel it cooperatively (even before the pipeline exists) and join with a timeout.
+    def __init__(self, target, name="pipeline-worker"):
+        self.target = target
+        self.name = name
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pipeline = None
+        self._cancelled = threading.Event()
+        self._paused = False
+
+    @property
+    def active(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def paused(self):
+        return self.active and self._paused
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def start(self):
+        # Returns False while a previous worker is still alive (e.g. a stop() that timed out)
+        with self._lock:
+            if self.active:
+                return False
+            self._cancelled.clear()
+            self._paused = False
+            self._thread = threading.Thread(target=self.target, args=(self,), name=self.name, daemon=True)
+            self._thread.start()
+            return True
+
+    def run_pipeline(self, pipeline):
+        # Returns True when the pipeline ran to the end of its source
+        with self._lock:
+            if self._cancelled.is_set():
+                return False
+            self._pipeline = pipeline
+            if self._paused:
+                pipeline.pause()
+        try:
+            pipeline.run()
+        finally:
+            with self._lock:
+                self._pipeline = None
+        return not pipeline.stopped
+
+    def pause(self):
+        with self._lock:
+            self._paused = True
+            if self._pipeline is not None:
+                self._pipeline.pause()
+
+    def resume(self):
+        with self._lock:
+            self._paused = False
+            if self._pipeline is not None:
+                self._pipeline.resume()
+
+    def stop(self, timeout=5.0):
+        # Returns True once no worker thread is left running
+        with self._lock:
+            self._cancelled.set()
+            if self._pipeline is not None:
+                self._pipeline.stop()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        return not self.active
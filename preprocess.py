@@ -0,0 +1,99 @@
+import math
+
+import cv2
+import numpy as np
+
+PAD_VALUE = 114  # Same grey ultralytics pads with
+
+
+class LetterboxedFrame:
+    # Model input made from one source frame, plus what is needed to map detections back
+    __slots__ = ("image", "scale", "pad", "source_size", "display_size")
+
+    def __init__(self, image, scale, pad, source_size, display_size):
+        self.image = image
+        self.scale = scale
+        self.pad = pad                     # (left, top) padding in model-input pixels
+        self.source_size = source_size     # (width, height) of the decoded frame
+        self.display_size = display_size   # (width, height) the annotators draw at
+
+    def restore(self, detections):
+        # Model-input coordinates -> display coordinates
+        if len(detections) == 0:
+            return detections
+        left, top = self.pad
+        display_width, display_height = self.display_size
+        factor = np.array([display_width / self.source_size[0], display_height / self.source_size[1]] * 2) / self.scale
+        restored = detections[:]
+        xyxy = (detections.xyxy - np.array([left, top, left, top])) * factor
+        restored.xyxy = np.clip(xyxy, 0, [display_width, display_height, display_width, display_height]).astype(np.float32)
+        if detections.mask is not None:
+            width = int(round(self.source_size[0] * self.scale))
+            height = int(round(self.source_size[1] * self.scale))
+            restored.mask = np.stack([
+                cv2.resize(mask[top:top + height, left:left + width].view(np.uint8), self.display_size,
+                           interpolation=cv2.INTER_NEAREST).view(bool)
+                for mask in detections.mask
+            ])
+        return restored
+
+
+class SourceFrameInput:
+    # Hands the detector the decoded frame itself, for detectors that crop it (RoiTracker) and so
+    # should see full source resolution. restore() maps the boxes to display coordinates exactly
+    # as for a letterboxed input (scale 1, no padding).
+    def __init__(self, display_size=None):
+        self.display_size = display_size
+
+    def __call__(self, frame, buffer=None):
+        height, width = frame.shape[:2]
+        return LetterboxedFrame(frame, 1.0, (0, 0), (width, height), self.display_size or (width, height))
+
+
+class LetterboxPreprocessor:
+    # Letterboxes source frames straight to the model input size, in one resize, into a ring of
+    # preallocated buffers. The padding follows ultralytics' rect inference (long side = imgsz,
+    # short side padded up to a multiple of the model stride), so ultralytics finds the frame
+    # already at its input size and skips its own resize. The display frame is resized
+    # separately and detections are mapped onto it with LetterboxedFrame.restore().
+    # pool_size must cover every model input alive at once: queue depth + batch size + 2 is enough.
+    def __init__(self, imgsz=640, display_size=None, stride=32, pool_size=8):
+        self.imgsz = imgsz
+        self.display_size = display_size  # None draws at source resolution
+        self.stride = stride
+        self.pool_size = pool_size
+        self._pool = []
+        self._next = 0
+
+    def _buffer(self, shape):
+        if not self._pool or self._pool[0].shape != shape:
+            self._pool = [np.full(shape, PAD_VALUE, dtype=np.uint8) for _ in range(self.pool_size)]
+        buffer = self._pool[self._next]
+        self._next = (self._next + 1) % self.pool_size
+        return buffer
+
+    def layout(self, width, height):
+        # (input shape, scale, resized (width, height), (left, top) padding) for a source frame size
+        scale = min(self.imgsz / height, self.imgsz / width)
+        new_width, new_height = int(round(width * scale)), int(round(height * scale))
+        input_width = math.ceil(new_width / self.stride) * self.stride
+        input_height = math.ceil(new_height / self.stride) * self.stride
+        pad = ((input_width - new_width) // 2, (input_height - new_height) // 2)
+        return (input_height, input_width, 3), scale, (new_width, new_height), pad
+
+    def __call__(self, frame, buffer=None):
+        # `buffer` (already filled with PAD_VALUE) replaces the internal pool, e.g. a shared-memory slot
+        height, width = frame.shape[:2]
+        shape, scale, (new_width, new_height), (left, top) = self.layout(width, height)
+        if buffer is None:
+            buffer = self._buffer(shape)
+        # The padding was filled when the buffer was allocated and the image always lands in the same place
+        cv2.resize(frame, (new_width, new_height), dst=buffer[top:top + new_height, left:left + new_width],
+                   interpolation=cv2.INTER_LINEAR)
+        return LetterboxedFrame(buffer, scale, (left, top), (width, height), self.display_size or (width, height))
+
+    def display(self, frame):
+        # Display-resolution copy of the source frame (the only other resize per frame)
+        if self.display_size is None or (frame.shape[1], frame.shape[0]) == tuple(self.display_size):
+            return frame
+        return cv2.resize(frame, self.display_size)
@@ -0,0 +1,128 @@
+import argparse
+import functools
+import os
+
+import cv2
+
+from annotators import ANNOTATOR_MODES, make_annotator
+from batch_infer import BatchedPersonTracker
+from count_log import CountLog
+from detection import PersonTracker, count_persons
+from detector_backend import BACKENDS, DEFAULT_BACKEND, load_detector
+from frame_reader import SampledFrameReader, parse_size
+from pipeline import StagedPipeline
+from preprocess import LetterboxPreprocessor, SourceFrameInput
+from roi import RoiTracker, load_rois, parse_roi
+from shm_ring import ProcessPipeline, person_tracker
+from video_export import BackgroundVideoWriter
+
+
+class AnnotatorSink:
+    # One output style: annotates its own copy of each frame and hands it to its own encoder thread
+    def __init__(self, mode, path, fps, size, source_fps=None):
+        self.mode = mode
+        self.path = path
+        self.annotator = make_annotator(mode)
+        self.writer = BackgroundVideoWriter(path, fps, size, source_fps=source_fps)
+
+    def write(self, frame, detections, person_count, timestamp=None):
+        frame = frame.copy()  # Annotators draw in place and every sink needs a clean frame
+        frame = self.annotator.annotate(frame, detections)  # Empty frames too, so heatmaps and traces keep ageing
+        cv2.putText(frame, f"Persons detected: {person_count}", (10, 50),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
+        self.writer.write(frame, timestamp)
+
+    def close(self):
+        self.writer.close()
+
+
+def render_all(video_path, modes, output_dir, model_path="yolo11s.pt", size=(1020, 600),
+               stride=1, batch_size=1, queue_depth=4, backend=None, rois=None, output_size=None, output_fps=None,
+               processes=False, log_path=None):
+    # Runs detection and tracking once per sampled frame and fans the detections out to every sink.
+    # With processes=True decoding and YOLO run in their own processes (per-frame tracking only).
+    # log_path appends per-frame counts and track boxes to a CountLog.
+    os.makedirs(output_dir, exist_ok=True)
+    processes = processes and not rois and batch_size == 1
+    model = None if processes else load_detector(model_path, backend=backend)
+    reader = SampledFrameReader(video_path, stride=stride)
+    fps = reader.source_fps / stride
+    if processes:
+        tracker = functools.partial(person_tracker, model_path, backend, frame_rate=fps)
+    elif rois:
+        tracker = RoiTracker(model, rois, frame_rate=fps)  # Crops of one frame share a predict call
+        batch_size = 1
+    elif batch_size > 1:
+        tracker = BatchedPersonTracker(model, frame_rate=fps).track_batch
+    else:
+        tracker = PersonTracker(model, frame_rate=fps)
+
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    count_log = CountLog(log_path) if log_path else None
+    sinks = [AnnotatorSink(mode, os.path.join(output_dir, f"{stem}_{mode}.mp4"), output_fps or fps, output_size or size,
+                           source_fps=fps) for mode in modes]
+
+    def render(packet):
+        # Every sink annotates its own copy; the source timestamp keeps the encoded timing right at any stride
+        person_count = count_persons(packet.detections)
+        timestamp = packet.index / reader.source_fps
+        if count_log is not None:
+            count_log.log_frame(video_path, packet.index, packet.detections, person_count, video_time=timestamp)
+        for sink in sinks:
+            sink.write(packet.frame, packet.detections, person_count, timestamp)
+
+    if processes:
+        # Sinks copy each frame before drawing, so handing them shared-memory slots is safe
+        pipeline = ProcessPipeline(video_path, tracker, lambda frame, detections: frame, render, size=size,
+                                   stride=stride, slots=queue_depth * 2)
+    else:
+        # The detector gets its own letterboxed input; ROI crops are taken from the full-resolution source frame
+        if rois:
+            preprocess = SourceFrameInput(display_size=size)
+        else:
+            preprocess = LetterboxPreprocessor(display_size=size, pool_size=queue_depth + batch_size + 2)
+        pipeline = StagedPipeline(reader, tracker, lambda frame, detections: frame, render,
+                                  prepare=lambda frame: cv2.resize(frame, size),
+                                  queue_depth=queue_depth, batch_size=batch_size, prepare_input=preprocess)
+    try:
+        pipeline.run()
+    finally:
+        reader.release()
+        for sink in sinks:
+            sink.close()
+        if count_log is not None:
+            count_log.close()
+    return [sink.path for sink in sinks]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect people once and render the video in several annotation styles")
+    parser.add_argument("video")
+    parser.add_argument("--modes", nargs="+", default=list(ANNOTATOR_MODES), choices=list(ANNOTATOR_MODES))
+    parser.add_argument("--output-dir", default="rendered")
+    parser.add_argument("--model", default="yolo11s.pt")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS)
+    parser.add_argument("--size", type=parse_size, default=(1020, 600), help="Processing size as WIDTHxHEIGHT")
+    parser.add_argument("--output-size", type=parse_size, help="Encoded WIDTHxHEIGHT (default: --size)")
+    parser.add_argument("--output-fps", type=float, help="Encoded frame rate (default: the sampled rate)")
+    parser.add_argument("--stride", type=int, default=1, help="Process every n-th frame")
+    parser.add_argument("--batch-size", type=int, default=1, help="Frames per YOLO call (same tracker IDs at any size)")
+    parser.add_argument("--processes", action="store_true",
+                        help="Decode and detect in separate processes, passing frames through shared memory")
+    parser.add_argument("--roi", type=parse_roi, action="append", default=[],
+                        help="Detection area x1,y1,x2,y2 as frame fractions; repeat for several")
+    parser.add_argument("--roi-file", help="JSON file with {\"rois\": [[x1, y1, x2, y2], ...]}, as saved by the app")
+    parser.add_argument("--log", help="SQLite file to append per-frame counts and track boxes to")
+    args = parser.parse_args()
+
+    rois = args.roi + (load_rois(args.roi_file) if args.roi_file else [])
+
+    for path in render_all(args.video, args.modes, args.output_dir, model_path=args.model, size=args.size,
+                           stride=args.stride, batch_size=args.batch_size, backend=args.backend, rois=rois,
+                           output_size=args.output_size, output_fps=args.output_fps, processes=args.processes,
+                           log_path=args.log):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
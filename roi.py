@@ -0,0 +1,98 @@
+import json
+import time
+
+import numpy as np
+
+from detection import PERSON_CLASS_ID, require_predict_only
+
+# ROIs are (x1, y1, x2, y2) as fractions of the frame, so the same config works at any resolution
+
+
+def parse_roi(text):
+    # "x1,y1,x2,y2" in frame fractions, e.g. "0.3,0.2,0.7,1.0"
+    x1, y1, x2, y2 = (float(value) for value in text.split(","))
+    return normalize_roi((x1, y1, x2, y2))
+
+
+def normalize_roi(roi):
+    x1, y1, x2, y2 = (min(max(float(value), 0.0), 1.0) for value in roi)
+    x1, x2 = sorted((x1, x2))
+    y1, y2 = sorted((y1, y2))
+    if x2 <= x1 or y2 <= y1:
+        raise ValueError(f"Empty region of interest: {roi}")
+    return x1, y1, x2, y2
+
+
+def load_rois(path):
+    with open(path) as handle:
+        return [normalize_roi(roi) for roi in json.load(handle)["rois"]]
+
+
+def save_rois(path, rois):
+    with open(path, "w") as handle:
+        json.dump({"rois": [list(roi) for roi in rois]}, handle, indent=2)
+
+
+def roi_pixels(rois, width, height):
+    # Integer crop boxes for a frame of the given size
+    boxes = np.array(rois, dtype=np.float64).reshape(-1, 4) * [width, height, width, height]
+    return boxes.round().astype(int)
+
+
+class RoiTracker:
+    # Person detection limited to the regions of interest. All crops go through one predict call;
+    # ultralytics letterboxes each crop to the model input size, so a small doorway is seen at
+    # full model resolution instead of as a corner of a downscaled frame. Boxes are shifted back
+    # to frame coordinates, duplicates from overlapping ROIs are removed with NMS, and a ByteTrack
+    # assigns the IDs. Called per frame like PersonTracker, with the source frame (see
+    # preprocess.SourceFrameInput): crops of an already downscaled frame would only be upscaled again.
+    def __init__(self, model, rois, imgsz=None, frame_rate=30, nms_threshold=0.5, stats=None):
+        import supervision as sv
+
+        require_predict_only(model)
+        self.model = model
+        self.rois = [normalize_roi(roi) for roi in rois]
+        self.imgsz = imgsz  # Model input size; None keeps the model default
+        self.frame_rate = frame_rate
+        self.nms_threshold = nms_threshold
+        self.stats = stats
+        self.byte_track = sv.ByteTrack(frame_rate=int(round(frame_rate)))
+
+    def detect(self, frame):
+        import supervision as sv
+
+        height, width = frame.shape[:2]
+        boxes = roi_pixels(self.rois, width, height)
+        boxes = boxes[(boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])]
+        if len(boxes) == 0:
+            return sv.Detections.empty()
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in boxes]
+        options = {} if self.imgsz is None else {"imgsz": self.imgsz}
+        results = self.model.predict(crops, classes=PERSON_CLASS_ID, verbose=False, **options)
+
+        merged = []
+        for (x1, y1, _, _), result in zip(boxes, results):
+            detections = sv.Detections.from_ultralytics(result)
+            if len(detections) == 0:
+                continue
+            detections.xyxy = detections.xyxy + np.array([x1, y1, x1, y1], dtype=detections.xyxy.dtype)
+            merged.append(detections)
+        if not merged:
+            return sv.Detections.empty()
+        detections = sv.Detections.merge(merged)
+        if len(merged) > 1:
+            detections = detections.with_nms(threshold=self.nms_threshold)  # People standing in two ROIs
+        return detections
+
+    def __call__(self, frame):
+        start = time.perf_counter()
+        detections = self.detect(frame)
+        detected = time.perf_counter()
+        tracked = self.byte_track.update_with_detections(detections)
+        if self.stats is not None:
+            self.stats.record("inference", detected - start)
+            self.stats.record("tracking", time.perf_counter() - detected)
+        return tracked
+
+    def reset(self):
+        self.byte_track.reset()
@@ -0,0 +1,243 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from detection_cache import DetectionCacheWriter
+from detector_backend import BACKENDS, DEFAULT_BACKEND
+from frame_reader import SampledFrameReader, parse_size
+from preprocess import LetterboxPreprocessor
+
+_worker = {}  # Per-process detector state, set up once by the pool initializer
+
+
+def plan_segments(total_frames, segments, overlap):
+    # [start, end) frame ranges covering the video; each one also reads `overlap` frames into the next
+    length = math.ceil(total_frames / segments)
+    plan = []
+    for start in range(0, total_frames, length):
+        end = min(total_frames, start + length + overlap)
+        plan.append((start, end if start + length < total_frames else None))  # The last one reads to EOF
+    return plan
+
+
+def _init_worker(weights, backend, threads, tracker_factory):
+    # One model per process; cores are shared out between processes instead of oversubscribed
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker["tracker_factory"] = tracker_factory
+    if tracker_factory is None:
+        from detector_backend import load_detector
+        _worker["model"] = load_detector(weights, backend=backend)
+
+
+def _segment_tracker(frame_rate):
+    if _worker["tracker_factory"] is not None:
+        return _worker["tracker_factory"](frame_rate=frame_rate)
+    from batch_infer import BatchedPersonTracker
+    return BatchedPersonTracker(_worker["model"], frame_rate=frame_rate)
+
+
+def process_segment(video_path, start, end, stride=1, size=(1020, 600), batch_size=8):
+    # Runs in a pool process: detection + a fresh tracker over one frame range, IDs local to it
+    started = time.perf_counter()
+    collected = DetectionCacheWriter(None, None)
+    with SampledFrameReader(video_path, stride=stride, start=start, end=end) as reader:
+        tracker = _segment_tracker(reader.source_fps / stride)
+        preprocess = LetterboxPreprocessor(display_size=size, pool_size=batch_size + 1)
+        batch = []
+
+        def flush():
+            detections = tracker.track_batch([model_input.image for _, model_input in batch])
+            for (index, model_input), frame_detections in zip(batch, detections):
+                collected.add(index, model_input.restore(frame_detections))
+            batch.clear()
+
+        for index, frame in reader:
+            batch.append((index, preprocess(frame)))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    columns = collected.columns()
+    columns["start"] = start
+    columns["end"] = end
+    columns["seconds"] = time.perf_counter() - started
+    return columns
+
+
+def box_iou(a, b):
+    # Pairwise IoU of two (N, 4) / (M, 4) xyxy arrays
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-9)
+
+
+def _frame_rows(columns, frame_index):
+    position = np.searchsorted(columns["frame_index"], frame_index)
+    if position >= len(columns["frame_index"]) or columns["frame_index"][position] != frame_index:
+        return slice(0, 0)
+    return slice(int(columns["offsets"][position]), int(columns["offsets"][position + 1]))
+
+
+def match_tracks(previous, current, frames, iou_threshold=0.5, min_votes=3):
+    # {current local ID: previous local ID} from box overlap on the frames both segments processed.
+    # Every frame votes for the pairs it matches greedily by IoU; the pairs with most votes win.
+    votes = {}
+    for frame_index in frames:
+        rows_a, rows_b = _frame_rows(previous, frame_index), _frame_rows(current, frame_index)
+        ids_a, ids_b = previous["tracker_id"][rows_a], current["tracker_id"][rows_b]
+        if len(ids_a) == 0 or len(ids_b) == 0:
+            continue
+        iou = box_iou(previous["xyxy"][rows_a], current["xyxy"][rows_b])
+        while True:
+            i, j = np.unravel_index(np.argmax(iou), iou.shape)
+            if iou[i, j] < iou_threshold:
+                break
+            pair = (int(ids_b[j]), int(ids_a[i]))
+            votes[pair] = votes.get(pair, 0) + 1
+            iou[i, :] = 0
+            iou[:, j] = 0
+
+    matches, taken = {}, set()
+    for (id_b, id_a), count in sorted(votes.items(), key=lambda item: -item[1]):
+        if count >= min_votes and id_b not in matches and id_a not in taken:
+            matches[id_b] = id_a
+            taken.add(id_a)
+    return matches
+
+
+def stitch_segments(segments, iou_threshold=0.5, min_votes=3):
+    # Global tracker IDs across segments, then one set of columns: each overlap is split at its
+    # midpoint (the later tracker has warmed up by then) and global IDs are renumbered from 1.
+    id_maps = []
+    next_id = 1
+    for position, current in enumerate(segments):
+        mapping = {}
+        if position > 0:
+            previous = segments[position - 1]
+            last = previous["frame_index"][-1] if len(previous["frame_index"]) else -1
+            overlap = current["frame_index"][current["frame_index"] <= last]
+            for id_b, id_a in match_tracks(previous, current, overlap, iou_threshold, min_votes).items():
+                mapping[id_b] = id_maps[-1][id_a]
+        for local in np.unique(current["tracker_id"]):
+            if int(local) not in mapping and local >= 0:
+                mapping[int(local)] = next_id
+                next_id += 1
+        id_maps.append(mapping)
+
+    frames, counts, parts = [], [], {"xyxy": [], "class_id": [], "tracker_id": [], "confidence": []}
+    for position, (current, mapping) in enumerate(zip(segments, id_maps)):
+        keep_from = current["start"]
+        if position > 0 and segments[position - 1]["end"] is not None:
+            keep_from = (current["start"] + segments[position - 1]["end"]) // 2
+        keep_to = None
+        if position + 1 < len(segments) and current["end"] is not None:
+            keep_to = (segments[position + 1]["start"] + current["end"]) // 2
+        for row, frame_index in enumerate(current["frame_index"]):
+            if frame_index < keep_from or (keep_to is not None and frame_index >= keep_to):
+                continue
+            rows = slice(int(current["offsets"][row]), int(current["offsets"][row + 1]))
+            frames.append(int(frame_index))
+            counts.append(rows.stop - rows.start)
+            parts["xyxy"].append(current["xyxy"][rows])
+            parts["class_id"].append(current["class_id"][rows])
+            parts["tracker_id"].append(np.array([mapping.get(int(local), -1) for local in current["tracker_id"][rows]],
+                                                dtype=np.int32))
+            parts["confidence"].append(current["confidence"][rows])
+
+    columns = {
+        "frame_index": np.asarray(frames, dtype=np.int64),
+        "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        "xyxy": np.concatenate(parts["xyxy"]) if frames else np.empty((0, 4), dtype=np.float32),
+        "class_id": np.concatenate(parts["class_id"]) if frames else np.empty(0, dtype=np.int16),
+        "tracker_id": np.concatenate(parts["tracker_id"]) if frames else np.empty(0, dtype=np.int32),
+        "confidence": np.concatenate(parts["confidence"]) if frames else np.empty(0, dtype=np.float32),
+    }
+    known = columns["tracker_id"] >= 0
+    _, dense = np.unique(columns["tracker_id"][known], return_inverse=True)
+    columns["tracker_id"][known] = dense + 1  # IDs only seen in discarded overlap halves leave no gaps
+    return columns
+
+
+def summarize(columns, source_fps):
+    counts = np.diff(columns["offsets"])
+    return {
+        "frames": int(len(columns["frame_index"])),
+        "duration_s": round(float(columns["frame_index"][-1] + 1) / source_fps, 2) if len(counts) else 0.0,
+        "unique_persons": int(len(np.unique(columns["tracker_id"][columns["tracker_id"] >= 0]))),
+        "max_in_frame": int(counts.max()) if len(counts) else 0,
+        "mean_in_frame": round(float(counts.mean()), 2) if len(counts) else 0.0,
+    }
+
+
+def process_video(video_path, weights="yolo11s.pt", backend=None, workers=None, overlap_seconds=2.0, stride=1,
+                  size=(1020, 600), batch_size=8, segments=None, iou_threshold=0.5, tracker_factory=None):
+    # Splits the video into overlapping segments, runs them in a process pool and stitches the IDs.
+    # tracker_factory replaces YOLO (`weights`) as the detector: a picklable callable run in each
+    # worker as tracker_factory(frame_rate=...) that returns an object with track_batch(frames),
+    # such as benchmark.StubDetector for synthetic videos.
+    workers = workers or os.cpu_count() or 1
+    with SampledFrameReader(video_path) as reader:
+        total = int(reader.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        source_fps = reader.source_fps
+    if total <= 0:
+        raise ValueError(f"Cannot tell how many frames {video_path} has")
+    overlap = int(round(overlap_seconds * source_fps))
+    plan = plan_segments(total, segments or workers, overlap)
+
+    started = time.perf_counter()
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    context = multiprocessing.get_context("spawn")  # Forking after torch/OpenCV threads start is unsafe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(weights, backend, threads, tracker_factory)) as pool:
+        futures = [pool.submit(process_segment, video_path, start, end, stride, size, batch_size)
+                   for start, end in plan]
+        results = [future.result() for future in futures]
+    columns = stitch_segments(results, iou_threshold=iou_threshold)
+
+    summary = summarize(columns, source_fps)
+    summary.update({
+        "segments": len(plan),
+        "workers": workers,
+        "wall_s": round(time.perf_counter() - started, 2),
+        "segment_s": [round(result["seconds"], 2) for result in results],
+    })
+    return columns, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process a long video in parallel segments with stitched track IDs")
+    parser.add_argument("video")
+    parser.add_argument("--model", default="yolo11s.pt", help="YOLO weights")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--segments", type=int, help="Number of segments (default: one per worker)")
+    parser.add_argument("--overlap", type=float, default=2.0, help="Seconds each segment overlaps the next")
+    parser.add_argument("--stride", type=int, default=1, help="Process every n-th frame")
+    parser.add_argument("--size", type=parse_size, default=(1020, 600), help="Coordinate frame WIDTHxHEIGHT")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--output", default="detections.npz", help="Stitched detections in the cache's column layout")
+    args = parser.parse_args()
+
+    columns, summary = process_video(args.video, args.model, args.backend, args.workers, args.overlap, args.stride,
+                                     args.size, args.batch_size, args.segments)
+    np.savez_compressed(args.output, **columns)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
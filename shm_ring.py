@@ -0,0 +1,223 @@
+import multiprocessing
+import queue
+import time
+import traceback
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from pipeline import FramePacket
+from preprocess import PAD_VALUE, LetterboxedFrame, LetterboxPreprocessor
+
+_END = None  # End-of-stream message on the slot queues
+
+
+class SharedFrameRing:
+    # Fixed pool of equally shaped frames in one shared-memory block. Pickling a ring (e.g. as a
+    # Process argument) sends only its name, and the other process maps the same memory, so
+    # frames move between processes as slot numbers instead of copies.
+    def __init__(self, slots, shape, dtype=np.uint8, name=None, fill=0):
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        size = slots * int(np.prod(self.shape)) * self.dtype.itemsize
+        self.owner = name is None
+        # Processes started by multiprocessing share the creator's resource tracker, so attaching
+        # does not add a second owner: only the creator unlinks the block
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=self.memory.buf)
+        if self.owner and fill:
+            self.frames.fill(fill)
+
+    def __getitem__(self, slot):
+        return self.frames[slot]
+
+    def __reduce__(self):
+        return SharedFrameRing, (self.slots, self.shape, self.dtype.str, self.memory.name)
+
+    def close(self):
+        self.frames = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _END
+
+
+def _decode_process(video_path, stride, target_fps, size, imgsz, display_ring, input_ring, free, decoded, stop,
+                    resume):
+    # Decodes into a free slot: display-size frame into one ring, letterboxed model input into the other
+    from frame_reader import SampledFrameReader
+
+    cv2.setNumThreads(1)
+    preprocess = LetterboxPreprocessor(imgsz=imgsz, display_size=size)
+    try:
+        with SampledFrameReader(video_path, stride=stride, target_fps=target_fps) as reader:
+            frames = iter(reader)
+            while not stop.is_set():
+                if not resume.wait(0.1):
+                    continue
+                start = time.perf_counter()
+                item = next(frames, None)
+                if item is None:
+                    break
+                index, frame = item
+                decoded_at = time.perf_counter()
+                slot = _get(free, stop)
+                if slot is _END:
+                    break
+                model_input = preprocess(frame, buffer=input_ring[slot])
+                cv2.resize(frame, size, dst=display_ring[slot])
+                timings = {"decode": decoded_at - start, "prepare": time.perf_counter() - decoded_at}
+                decoded.put((slot, index, (model_input.scale, model_input.pad, model_input.source_size), timings))
+    except Exception:
+        decoded.put(("error", traceback.format_exc()))
+    finally:
+        decoded.put(_END)
+
+
+def _infer_process(tracker_factory, size, input_ring, decoded, inferred, stop):
+    # Runs the tracker on the model input in each slot; only the (small) detections travel back
+    try:
+        tracker = tracker_factory()
+        while True:
+            message = _get(decoded, stop)
+            if message is _END or message[0] == "error":
+                inferred.put(message)
+                break
+            slot, index, (scale, pad, source_size), timings = message
+            start = time.perf_counter()
+            model_input = LetterboxedFrame(input_ring[slot], scale, pad, source_size, size)
+            detections = model_input.restore(tracker(model_input.image))
+            timings["infer"] = time.perf_counter() - start
+            inferred.put((slot, index, detections, timings))
+    except Exception:
+        inferred.put(("error", traceback.format_exc()))
+    finally:
+        inferred.put(_END)
+
+
+class ProcessPipeline:
+    # StagedPipeline with decode and inference in their own processes, so neither competes with
+    # annotation (which stays in this process, next to the sink) for the GIL.
+    # Frames live in shared-memory rings of `slots` slots. Protocol: the decoder takes a slot
+    # number from `free`, fills it and sends it on; the inference process sends the slot on with
+    # its detections; this process annotates the display frame in place, calls the sink and
+    # acks by returning the slot to `free`. The sink's packet.frame is a view into shared
+    # memory: copy it if it has to outlive the sink call.
+    # `tracker_factory` is called in the inference process, so it must be picklable
+    # (a module-level function or functools.partial of one).
+    def __init__(self, video_path, tracker_factory, annotate, sink, size=(900, 750), stride=1, target_fps=None,
+                 imgsz=640, slots=8, stats=None):
+        self.video_path = video_path
+        self.tracker_factory = tracker_factory
+        self.annotate = annotate
+        self.sink = sink
+        self.size = tuple(size)
+        self.stride = stride
+        self.target_fps = target_fps
+        self.imgsz = imgsz
+        self.slots = slots
+        self.stats = stats
+
+        self._context = multiprocessing.get_context("spawn")
+        self._stop = self._context.Event()
+        self._resume = self._context.Event()
+        self._resume.set()
+        self.error = None
+
+    def stop(self):
+        self._stop.set()
+
+    def pause(self):
+        self._resume.clear()
+
+    def resume(self):
+        self._resume.set()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    @property
+    def paused(self):
+        return not self._resume.is_set()
+
+    def _input_shape(self):
+        capture = cv2.VideoCapture(self.video_path)
+        width, height = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        capture.release()
+        if width <= 0 or height <= 0:
+            raise IOError(f"Could not open {self.video_path}")
+        return LetterboxPreprocessor(imgsz=self.imgsz).layout(width, height)[0]
+
+    def run(self):
+        # Blocks until the video is exhausted, stop() is called or a process fails
+        display_ring = SharedFrameRing(self.slots, (self.size[1], self.size[0], 3))
+        input_ring = SharedFrameRing(self.slots, self._input_shape(), fill=PAD_VALUE)
+        free, decoded, inferred = self._context.Queue(), self._context.Queue(), self._context.Queue()
+        for slot in range(self.slots):
+            free.put(slot)
+        processes = [
+            self._context.Process(target=_decode_process, name="decode", daemon=True,
+                                  args=(self.video_path, self.stride, self.target_fps, self.size, self.imgsz,
+                                        display_ring, input_ring, free, decoded, self._stop, self._resume)),
+            self._context.Process(target=_infer_process, name="infer", daemon=True,
+                                  args=(self.tracker_factory, self.size, input_ring, decoded, inferred, self._stop)),
+        ]
+        for process in processes:
+            process.start()
+        try:
+            while True:
+                message = _get(inferred, self._stop)
+                if message is _END:
+                    break
+                if message[0] == "error":
+                    self.error = RuntimeError(f"Pipeline process failed:\n{message[1]}")
+                    break
+                slot, index, detections, timings = message
+                packet = FramePacket(index, display_ring[slot])
+                packet.detections = detections
+                packet.timings = timings
+                start = time.perf_counter()
+                packet.frame = self.annotate(packet.frame, detections)
+                timings["annotate"] = time.perf_counter() - start
+                self.sink(packet)
+                free.put(slot)  # Ack: the decoder may reuse the slot
+                if self.stats is not None:
+                    self.stats.record_timings(timings)
+                    self.stats.increment("frames")
+        finally:
+            completed = not self._stop.is_set() and self.error is None
+            self._stop.set()
+            for process in processes:
+                process.join(5.0)
+                if process.is_alive():
+                    process.terminate()
+            for q in (free, decoded, inferred):
+                q.cancel_join_thread()
+                q.close()
+            display_ring.close()
+            input_ring.close()
+            if completed:
+                self._stop.clear()  # Ran to the end: `stopped` stays False, as with StagedPipeline
+        if self.error is not None:
+            raise self.error
+
+
+def person_tracker(weights="yolo11s.pt", backend=None, motion_gate=False, frame_rate=30):
+    # Default tracker_factory: builds the detector inside the inference process
+    from detection import PersonTracker
+    from detector_backend import load_detector
+    from motion_gate import MotionGatedTracker
+
+    tracker = PersonTracker(load_detector(weights, backend=backend), frame_rate=frame_rate)
+    return MotionGatedTracker(tracker) if motion_gate else tracker
@@ -0,0 +1,104 @@
+import cv2
+import numpy as np
+
+
+class TrackHistory:
+    # Recent anchor points of every live track in preallocated arrays: a ring of `length` points per
+    # track and at most `max_tracks` tracks, so memory is fixed at construction however long the
+    # session runs. Tracks not seen for `idle_frames` frames are dropped; when all rows are taken
+    # the least recently seen track makes room for the new one.
+    def __init__(self, length=30, idle_frames=150, max_tracks=512):
+        self.length = length
+        self.idle_frames = idle_frames
+        self.max_tracks = max_tracks
+        self.points = np.zeros((max_tracks, length, 2), dtype=np.float32)
+        self.count = np.zeros(max_tracks, dtype=np.int32)      # Points stored per row (<= length)
+        self.head = np.zeros(max_tracks, dtype=np.int32)       # Next write position in the row's ring
+        self.last_seen = np.full(max_tracks, -1, dtype=np.int64)
+        self.track_ids = np.full(max_tracks, -1, dtype=np.int64)  # -1 marks a free row
+        self._rows = {}  # tracker_id -> row
+        self.frame = 0
+        self.evicted = 0
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.points, self.count, self.head, self.last_seen, self.track_ids))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _row(self, track_id):
+        row = self._rows.get(track_id)
+        if row is not None:
+            return row
+        free = np.flatnonzero(self.track_ids < 0)
+        if len(free):
+            row = int(free[0])
+        else:
+            row = int(np.argmin(self.last_seen))  # Global cap reached: reuse the stalest row
+            self._release(row)
+        self.track_ids[row] = track_id
+        self.count[row] = 0
+        self.head[row] = 0
+        self._rows[track_id] = row
+        return row
+
+    def _release(self, row):
+        del self._rows[int(self.track_ids[row])]
+        self.track_ids[row] = -1
+        self.last_seen[row] = -1
+        self.evicted += 1
+
+    def update(self, track_ids, points):
+        # One call per frame with the anchor point of every tracked detection
+        for track_id, point in zip(np.asarray(track_ids).tolist(), points):
+            row = self._row(track_id)
+            self.points[row, self.head[row]] = point
+            self.head[row] = (self.head[row] + 1) % self.length
+            self.count[row] = min(self.count[row] + 1, self.length)
+            self.last_seen[row] = self.frame
+        stale = np.flatnonzero((self.track_ids >= 0) & (self.frame - self.last_seen > self.idle_frames))
+        for row in stale:
+            self._release(int(row))
+        self.frame += 1
+
+    def trace(self, track_id):
+        # Stored points of one track, oldest first
+        row = self._rows.get(track_id)
+        if row is None:
+            return np.empty((0, 2), dtype=np.float32)
+        count, head = self.count[row], self.head[row]
+        if count < self.length:
+            return self.points[row, :count]
+        return np.roll(self.points[row], -head, axis=0)
+
+    def reset(self):
+        self.track_ids.fill(-1)
+        self.last_seen.fill(-1)
+        self._rows.clear()
+        self.frame = 0
+
+
+class BoundedTraceAnnotator:
+    # Drop-in for sv.TraceAnnotator (same look: centre-point polylines coloured by class) backed
+    # by a TrackHistory, so long looping sessions do not accumulate per-track state
+    def __init__(self, trace_length=30, thickness=2, idle_frames=150, max_tracks=512, color=None):
+        import supervision as sv
+
+        self.history = TrackHistory(trace_length, idle_frames, max_tracks)
+        self.thickness = thickness
+        self.palette = color or sv.ColorPalette.DEFAULT
+
+    def annotate(self, scene, detections):
+        if detections.tracker_id is None or len(detections) == 0:
+            self.history.update([], [])
+            return scene
+        centers = (detections.xyxy[:, :2] + detections.xyxy[:, 2:]) / 2
+        self.history.update(detections.tracker_id, centers)
+        class_ids = detections.class_id if detections.class_id is not None else np.zeros(len(detections), dtype=int)
+        for track_id, class_id in zip(detections.tracker_id.tolist(), class_ids.tolist()):
+            points = self.history.trace(track_id)
+            if len(points) > 1:
+                cv2.polylines(scene, [points.astype(np.int32)], False, self.palette.by_idx(class_id).as_bgr(),
+                              self.thickness)
+        return scene
@@ -0,0 +1,77 @@
+import queue
+import threading
+
+import cv2
+
+_CLOSE = object()
+
+
+class BackgroundVideoWriter:
+    # cv2.VideoWriter on its own thread behind a bounded queue. write() returns immediately
+    # unless `queue_depth` frames are already waiting, so processing only slows down to the
+    # encoder's speed when the encoder really is the bottleneck.
+    # Output size and fps are independent of the input: frames are resized on the encoder thread
+    # and resampled by timestamp (duplicated or dropped to hit `fps`).
+    def __init__(self, path, fps, size, source_fps=None, codec="mp4v", queue_depth=32):
+        self.path = path
+        self.fps = fps
+        self.size = tuple(size)
+        self.source_fps = source_fps or fps  # Timestamps of frames written without one
+        self.frames_in = 0
+        self.frames_out = 0
+        self.error = None
+        self._writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, self.size)
+        if not self._writer.isOpened():
+            raise IOError(f"Could not open {path} for writing")
+        self._queue = queue.Queue(maxsize=queue_depth)
+        self._next_time = 0.0  # Timestamp of the next output frame
+        self._thread = threading.Thread(target=self._encode, name=f"encoder-{path}", daemon=True)
+        self._thread.start()
+
+    def write(self, frame, timestamp=None):
+        # `frame` must not be modified by the caller afterwards; timestamp is in seconds
+        if self.error is not None:
+            raise self.error
+        if timestamp is None:
+            timestamp = self.frames_in / self.source_fps
+        self.frames_in += 1
+        self._queue.put((frame, timestamp))
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_CLOSE)
+            self._thread.join()
+        self._writer.release()
+        if self.error is not None:
+            raise self.error
+
+    def _encode(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _CLOSE:
+                    break
+                frame, timestamp = item
+                if timestamp + 0.5 / self.fps < self._next_time:
+                    continue  # Output rate is lower than the input: this frame falls between two slots
+                if (frame.shape[1], frame.shape[0]) != self.size:
+                    frame = cv2.resize(frame, self.size)
+                # The first frame starts the clock; each frame fills the output slots up to its own timestamp,
+                # so a slower input (or a gap) is stretched by repeating frames
+                if self.frames_out == 0:
+                    self._next_time = timestamp
+                while self._next_time <= timestamp + 0.5 / self.fps:
+                    self._writer.write(frame)
+                    self.frames_out += 1
+                    self._next_time += 1.0 / self.fps
+        except Exception as exc:
+            self.error = exc
+            while True:  # Keep draining so a blocked write() can see the error
+                if self._queue.get() is _CLOSE:
+                    break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()